@@ -1,19 +1,87 @@
 
+import asyncio
 import json
 import time
 import threading
-from core.optimizer import BayesianOptimizer
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from core import loader
 from mqtt.mqtt_handler import MQTTHandler
-from utils.data_handler import parse_input_parameters, parse_result_data, detect_trial_changes
+from utils.data_handler import detect_trial_changes
+from utils.metrics import METRICS
+from utils.persistence import checkpoint_path, write_json_atomic, read_json, TrialJournal
+from utils.profiling import ProfilingSession, NOT_PROFILING
+from utils.schemas import MessageSchemas, MessageError
 import traceback
 import numpy as np 
 
 
+BROKER_SETTINGS = {
+    "broker": "10.94.132.35",
+    "port": 1883,
+    "username": "superlabuser10",
+    "password": "XXXXXX",
+}
+
+# Setup keys that define the experiment itself; a setup that only changes other
+# keys (batch_size, speculative, ...) keeps the existing trials.
+EXPERIMENT_KEYS = ("parameters", "objective_name", "outcome_constraints", "experiment_name")
+
+# platform_status fields left out of its change detection
+VOLATILE_STATUS_KEYS = ("command_queue", "outbound_queue")
+
+
+def same_experiment(config_a, config_b):
+    return all(
+        json.dumps(config_a.get(k), sort_keys=True) == json.dumps(config_b.get(k), sort_keys=True)
+        for k in EXPERIMENT_KEYS
+    )
+
+
+class LoopTimer:
+    # threading.Timer look-alike scheduled from any thread onto an asyncio loop
+    def __init__(self, loop, delay, func, *args):
+        self._loop = loop
+        self._handle = None
+        self._cancelled = False
+        loop.call_soon_threadsafe(self._schedule, delay, func, args)
+
+    def _schedule(self, delay, func, args):
+        if not self._cancelled:
+            self._handle = self._loop.call_later(delay, func, *args)
+
+    def cancel(self):
+        self._cancelled = True
+        self._loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
 
 
 class OptimizationHost:
-    def __init__(self, address="LC/R8/133-1-1/PC06/bay"):
+    # Inbound topic suffix -> (handler, where it runs): inline on the network
+    # thread, queue on the optimizer worker, or ready once Ax has been imported.
+    # Each payload is validated against self.schemas exactly once, by _dispatch.
+    ROUTES = {
+        "python": ("_on_trigger", "inline"),
+        "profile": ("_handle_profile_request", "inline"),
+        "tagmap": ("_on_tagmap", "queue"),
+        "setup": ("_on_setup", "ready"),
+        "input": ("_on_input", "ready"),
+        "result": ("_on_result", "ready"),
+        "data_in": ("_on_data_in", "ready"),
+        "data_request": ("_on_data_request", "ready"),
+        "history": ("_on_history", "ready"),
+    }
+    # Journaled with an fsync as soon as they arrive, so a crash while they wait
+    # in the queue (or behind the Ax import) does not lose them
+    DURABLE = ("result", "data_in")
+
+    def __init__(self, address="LC/R8/133-1-1/PC06/bay", executor=None, mqtt_handler=None, status_event=None,
+                 checkpoint_dir="checkpoints"):
         
+        self.address = address
         self.TRIGGER_TOPIC   = address+"/python"
         self.SETUP_TOPIC     = address+"/setup"
         self.TAGMAP_TOPIC    = address+"/tagmap"
@@ -23,34 +91,118 @@ class OptimizationHost:
         self.PLATFORM_STATUS = address+"/platform_status"
         self.DATA_IN_TOPIC   = address+"/data_in"
         self.DATA_OUT_TOPIC  = address+"/data" 
+        self.DATA_SNAPSHOT_TOPIC = address+"/data_snapshot"
+        self.DATA_REQUEST_TOPIC  = address+"/data_request"
+        self.HISTORY_TOPIC   = address+"/history"
+        self.METRICS_TOPIC   = address+"/metrics"
+        self.PROFILE_TOPIC   = address+"/profile"
 
         self.platform_running = False
         self.trigger_flag = False
         self.optimizer = None
-        self.last_suggestion = {}
         self.tag_map = {}
-        self.awaiting_result = False
-
-        self.mqtt_handler = MQTTHandler(
-            broker="10.94.132.35",
-            port=1883,
-            username="superlabuser10",
-            password="XXXXXX",
-            topics={
-                "trigger": self.TRIGGER_TOPIC,
-                "setup": self.SETUP_TOPIC,
-                "tagmap": self.TAGMAP_TOPIC,
-                "input": self.INPUT_TOPIC,
-                "result": self.RESULT_TOPIC,
-                "status": self.STATUS_TOPIC,
-                "platform_status": self.PLATFORM_STATUS,
-                "data_in": self.DATA_IN_TOPIC,
-                "data": self.DATA_OUT_TOPIC,
-            },
-        )
+        # Per-topic payload schemas, recompiled from every setup config
+        self.schemas = MessageSchemas()
+        self._config_ready = None  # Cached readiness; reset when setup/tagmap change
+        self.pending_trials = {}  # trial_index -> parameters published on input
+        self.batch_size = 1
+        self._published_trials = {}
+        self._published_version = 0
+        self._touched_trials = set()
+        self.data_seq = 0
+        self._deltas_since_snapshot = 0
+        self.snapshot_interval = 20
+
+        # Optimizer work runs off the paho network thread: handle_message only
+        # decodes and enqueues, a worker drains the queue one command at a time.
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="optimizer")
+        self._commands = deque()
+        self._queue_lock = threading.Lock()
+        self._worker_scheduled = False
+        # Commands that need Ax wait here until the background import finishes
+        self._deferred = deque()
+        self._optimizer_lock = threading.RLock()
+        self._run_epoch = 0
+        self.queue_stats = {"processed": 0, "last_wait_ms": 0.0, "max_wait_ms": 0.0, "last_run_ms": 0.0}
+        # (best, pending trials, model info) as of the last status the worker let through
+        self._last_optimizer_view = (None, [], None)
+
+        # platform_status is published when it changes, plus a low-frequency heartbeat
+        self.status_event = status_event or threading.Event()
+        # Set by serve(): the asyncio core that status wake-ups and timers run on
+        self._loop = None
+        self._wakeup = None
+        self.status_heartbeat = 60.0
+        self._last_status = None
+        self._last_status_time = 0.0
+        # Process-wide stage latencies (utils.metrics) on the metrics topic; 0 disables
+        self.metrics_interval = 30.0
+        self._last_metrics_time = 0.0
+
+        # Every state change is appended to a journal; checkpoints are taken every
+        # checkpoint_every events or checkpoint_interval_s and compact the journal
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = 30.0
+        self.checkpoint_every = 100
+        self._checkpoint_seq = 0
+        self._last_checkpoint_time = 0.0
+        self._checkpoint_timer = None
+        self.journal = TrialJournal(checkpoint_path(checkpoint_dir, address, ".journal")) if checkpoint_dir else None
+        # Durable messages received but not handled yet: journal seq -> (suffix, payload).
+        # Receipts up to _recover_upto come from an earlier run and are redispatched on restore.
+        self._inbox = {}
+        self._inbox_lock = threading.Lock()
+        self._receipt = None
+        self._recover_upto = self.journal.seq if self.journal is not None else 0
+
+        # Results and data_in edits arriving in a burst share one suggestion and
+        # one state publish: flushed when no more are queued and coalesce_window_s
+        # has passed since the last one, but never later than coalesce_max_delay_s
+        self.coalesce_window = 0.0
+        self.coalesce_max_delay = 1.0
+        self._dirty_since = None
+        self._dirty_epoch = None
+        self._last_mutation = 0.0
+        self._flush_timer = None
+
+        # On-demand profiling session started over the profile topic; None when off
+        self.profile_dir = "profiles"
+        self._profile = None
+
+        # Opt-in speculative mode: pre-generate the next candidate while a trial runs
+        self.speculative = False
+        self.speculation_z = 2.0
+        self._speculation = None
+
+        topics = {
+            "trigger": self.TRIGGER_TOPIC,
+            "setup": self.SETUP_TOPIC,
+            "tagmap": self.TAGMAP_TOPIC,
+            "input": self.INPUT_TOPIC,
+            "result": self.RESULT_TOPIC,
+            "status": self.STATUS_TOPIC,
+            "platform_status": self.PLATFORM_STATUS,
+            "data_in": self.DATA_IN_TOPIC,
+            "data": self.DATA_OUT_TOPIC,
+            "data_snapshot": self.DATA_SNAPSHOT_TOPIC,
+            "data_request": self.DATA_REQUEST_TOPIC,
+            "history": self.HISTORY_TOPIC,
+            "metrics": self.METRICS_TOPIC,
+            "profile": self.PROFILE_TOPIC,
+        }
+        # A multi-bay host passes its shared connection; publish through a channel on it
+        if mqtt_handler is not None:
+            self.mqtt_handler = mqtt_handler.channel(topics)
+        else:
+            self.mqtt_handler = MQTTHandler(topics=topics, **BROKER_SETTINGS)
 
     @property
     def config_ready(self):
+        if self._config_ready is None:
+            self._config_ready = self._check_config_ready()
+        return self._config_ready
+
+    def _check_config_ready(self):
         if not self.optimizer:
             print("[CONFIG CHECK] Optimizer not initialized.")
             return False
@@ -66,194 +218,577 @@ class OptimizationHost:
     def check_tag_exists(self, tag):
         return True if tag else False
 
+    @property
+    def awaiting_result(self):
+        return bool(self.pending_trials)
+
+    @METRICS.timed("match")
+    def _match_pending(self, parameters, trial_index=None):
+        if trial_index in self.pending_trials:
+            return trial_index
+        # Compare at the optimizer's per-parameter resolution, not as JSON text
+        key = self.optimizer.param_key(parameters)
+        for idx, pending in self.pending_trials.items():
+            if self.optimizer.param_key(pending) == key:
+                return idx
+        return None
+
+    def _journal(self, event, sync=False, **fields):
+        if self.journal is not None:
+            self.journal.append(event, sync=sync, **fields)
+
+    def _abandon_trials(self, trial_indices):
+        self._journal("abandon", trial_indices=list(trial_indices))
+        for idx in trial_indices:
+            self.optimizer.abandon_trial(idx)
+            self._touched_trials.add(idx)
+
     def handle_message(self, topic, payload):
+        # Runs on the paho network thread; must never block on the optimizer.
+        # The payload arrives decoded (MQTTHandler._on_message).
+        self.mqtt_handler.log("debug", f"[MQTT] Received on {topic}: {self.mqtt_handler.preview(payload)}")
+        address, _, suffix = topic.rpartition("/")
+        route = self.ROUTES.get(suffix) if address == self.address else None
+        if route is None:
+            return
+        if route[1] == "inline":
+            self._dispatch(suffix, payload)
+        elif route[1] == "queue":
+            self.enqueue(self._dispatch, suffix, payload)
+        else:
+            receipt = self._receive(suffix, payload) if suffix in self.DURABLE else None
+            self.enqueue_when_ready(self._dispatch, suffix, payload, receipt)
+
+    def _receive(self, suffix, payload):
+        if self.journal is None:
+            return None
+        with self._inbox_lock:
+            seq = self.journal.append("received", sync=True, topic=suffix, payload=payload)
+            self._inbox[seq] = (suffix, payload)
+        return seq
+
+    def _dispatch(self, suffix, payload, receipt=None):
+        # Validated right before the handler runs, so input/result are checked
+        # against the schemas of the setup that precedes them in the queue
+        handler = getattr(self, self.ROUTES[suffix][0])
+        if receipt is not None:
+            # Handlers journal their outcome with received=self._receipt
+            self._receipt = receipt
         try:
-            print(f"[MQTT] Received on {topic}: {payload}")
-            if topic == self.TRIGGER_TOPIC:
-                flag = json.loads(payload) if isinstance(payload, str) else payload
-                self.trigger_flag = bool(flag)
-
-                if not self.trigger_flag and self.platform_running:
-                    print("[TRIGGER] Trigger turned off. Stopping optimizer immediately.")
-                    self.platform_running = False
-                    self.awaiting_result = False  # Cancel any in-progress result wait
-                    self.mqtt_handler.publish("status", {"status": "waiting_trigger"})
-
-                elif self.trigger_flag and not self.platform_running and self.config_ready:
-                    print("[TRIGGER] Trigger turned on. Starting optimizer.")
-                    self.platform_running = True
-                    self.mqtt_handler.publish("status", {"status": "running"})
-                    self.send_suggestion()
-
-            elif topic == self.SETUP_TOPIC:
-                config = json.loads(payload) if isinstance(payload, str) else payload
-                if "parameters" not in config:
-                    raise ValueError("Missing 'parameters'")
-                self.optimizer = BayesianOptimizer(config, status_callback=self._optimizer_status)
-                self.mqtt_handler.publish("status", {"status": "setup_config_loaded"})
-
-            elif topic == self.TAGMAP_TOPIC:
-                mapping = json.loads(payload) if isinstance(payload, str) else payload
-                if not isinstance(mapping, dict):
-                    self.mqtt_handler.publish("platform_status", {"Config Ready": "Contact Custom Automation Team for set up"})
-                    raise ValueError("Tag map must be a dictionary")
-                self.mqtt_handler.publish("status", {"status": "tagmap_loaded"})
-                self.tag_map = mapping
-                self.mqtt_handler.publish("status", {"status": "tagmap_loaded"})
-
-            elif topic == self.INPUT_TOPIC:
-                if not self.platform_running:
-                    self.mqtt_handler.publish("status", {"status": "platform_idle", "message": "Not running"})
-                    return
-
-                payload = json.loads(payload) if isinstance(payload, str) else payload
-                parameters = parse_input_parameters(payload)
-                if not parameters:
-                    raise ValueError("Parsed input parameters are empty.")
-                self.last_suggestion = parameters
-                self.awaiting_result = True
-                self.mqtt_handler.publish("status", {"status": "input_received", "parameters": parameters})
-
-            elif topic == self.RESULT_TOPIC:
-                if not self.platform_running or not self.awaiting_result:
-                    self.mqtt_handler.publish("status", {"status": "platform_idle", "message": "Not awaiting result"})
-                    return
-
-                payload = json.loads(payload) if isinstance(payload, str) else payload
-                result_parameters, metrics = parse_result_data(payload)
-
-                if not result_parameters or not metrics:
-                    raise ValueError("Parsed result data is empty or invalid.")
-
-                if json.dumps(result_parameters, sort_keys=True) == json.dumps(self.last_suggestion, sort_keys=True):
-                    idx = self.optimizer.complete_or_attach_trial(result_parameters, metrics)
-                    self.mqtt_handler.publish("status", {"status": "trial_completed", "trial_index": idx})
-                    # 🔄 Publish optimizer state to data topic
-                    self.publish_optimizer_state()
-                else:
-                    idx = self.optimizer.complete_or_attach_trial(result_parameters, metrics)
-                    self.mqtt_handler.publish("status", {"status": "user_override", "trial_index": idx})
-                    # 🔄 Publish optimizer state to data topic
-                    self.publish_optimizer_state()
-
-                self.awaiting_result = False
-                self.send_suggestion()
+            with METRICS.timer("validate"):
+                message = self.schemas.validate(suffix, payload)
+            handler(message)
+        except MessageError as e:
+            self._reject(suffix, e)
+        except Exception as e:
+            print("[EXCEPTION TRACEBACK]")
+            traceback.print_exc()
+            self.mqtt_handler.publish("status", {
+                "status": "error",
+                "message": str(e)
+            })
+        finally:
+            if suffix in ("setup", "tagmap"):
+                self._readiness_changed()
+            if receipt is not None:
+                self._receipt = None
+                with self._inbox_lock:
+                    self._inbox.pop(receipt, None)
+                self._journal("handled", received=receipt)
 
-            elif topic == self.DATA_IN_TOPIC:
-                data = json.loads(payload) if isinstance(payload, str) else payload
+    def _reject(self, suffix, error):
+        METRICS.incr("messages_rejected")
+        print(f"[MQTT] Rejected {suffix} message: {error}")
+        if suffix == "tagmap":
+            self.mqtt_handler.publish("platform_status", {"Config Ready": "Contact Custom Automation Team for set up"})
+        self.mqtt_handler.publish("status", {
+            "status": "error",
+            "topic": suffix,
+            "message": str(error)
+        })
 
-                if not self.optimizer:
-                    self.mqtt_handler.publish("status", {"status": "error", "message": "Optimizer not initialized."})
-                    return
+    def _on_trigger(self, flag):
+        self.trigger_flag = flag
 
-                trials = data.get("trials", [])
-                if not trials:
-                    self.mqtt_handler.publish("status", {"status": "error", "message": "No trials in input."})
-                    return
+        if not self.trigger_flag and self.platform_running:
+            print("[TRIGGER] Trigger turned off. Stopping optimizer immediately.")
+            self.platform_running = False
+            self._run_epoch += 1  # Discard any suggestion still being generated
+            self.enqueue(self._stop_run)
+            self.mqtt_handler.publish("status", {"status": "waiting_trigger"})
 
-                trial = trials
-                metric_name = self.optimizer.config.get("objective_name", "yields")
-                df = self.optimizer.custom_summarize()
+        elif self.trigger_flag and not self.platform_running and self.config_ready:
+            print("[TRIGGER] Trigger turned on. Starting optimizer.")
+            self.platform_running = True
+            self.mqtt_handler.publish("status", {"status": "running"})
+            self.enqueue(self._start_run)
+        self.notify()
 
-                matched_idx, changes = detect_trial_changes(trial, df, metric_name)
+    def _apply_config(self, config):
+        self.schemas = MessageSchemas(config)
+        # Per-topic payload encodings (mqtt.codec), e.g. {"data": "columnar+zlib"}
+        self.mqtt_handler.set_encodings(config.get("encodings"))
+        self.snapshot_interval = int(config.get("snapshot_interval", 20))
+        self.speculative = bool(config.get("speculative", False))
+        self.speculation_z = float(config.get("speculation_z", 2.0))
+        self.batch_size = max(1, int(config.get("batch_size", 1)))
+        self.status_heartbeat = float(config.get("status_heartbeat_s", 60))
+        self.checkpoint_interval = float(config.get("checkpoint_interval_s", 30))
+        self.checkpoint_every = max(1, int(config.get("checkpoint_every", 100)))
+        self.metrics_interval = float(config.get("metrics_interval_s", 30))
+        self.coalesce_window = float(config.get("coalesce_window_s", 0))
+        self.coalesce_max_delay = float(config.get("coalesce_max_delay_s", 1.0))
+        self.profile_dir = config.get("profile_dir", "profiles")
 
-                parameters = trial[int(matched_idx)].get("parameters", {})
-                metrics = trial[int(matched_idx)].get("metrics", {})
+    def enqueue(self, func, *args):
+        with self._queue_lock:
+            self._commands.append((func, args, time.time()))
+            if self._worker_scheduled:
+                return
+            self._worker_scheduled = True
+        self.executor.submit(self._run_next_command)
 
-                # If awaiting result and new input does not match expected one
-                if self.awaiting_result and (
-                    json.dumps(parameters, sort_keys=True) != json.dumps(self.last_suggestion, sort_keys=True)
-                ):
-                    self.mqtt_handler.publish("status", {
-                        "status": "awaiting_result_abandoned",
-                        "message": "New manual input received. Previous suggestion abandoned.",
-                        "abandoned_trial": self.last_suggestion
-                    })
+    def enqueue_when_ready(self, func, *args):
+        loader.start_background_load()
+        with self._queue_lock:
+            # Keep arrival order: nothing overtakes commands already deferred
+            if self._deferred or not loader.is_ready():
+                self._deferred.append((func, args, time.time()))
+                defer = len(self._deferred) == 1
+            else:
+                defer = None
+        if defer is None:
+            self.enqueue(func, *args)
+        elif defer:
+            loader.when_ready(self._release_deferred)
 
-                    self.awaiting_result = False  # Clear previous expectation
+    def _release_deferred(self):
+        self.mqtt_handler.publish("status", {"status": "optimizer_ready", "import_timings": loader.get_timings()})
+        with self._queue_lock:
+            self._commands.extend(self._deferred)
+            self._deferred.clear()
+            if self._worker_scheduled or not self._commands:
+                return
+            self._worker_scheduled = True
+        self.executor.submit(self._run_next_command)
 
-                # Complete or inject trial
-                idx = self.optimizer.complete_or_attach_trial(parameters, metrics)
-                action = "manual_update" if matched_idx is not None else "manual_injection"
-                self.mqtt_handler.publish("status", {
-                    "status": action,
-                    "trial_index": idx,
-                    "changes": changes
-                })
+    def _run_next_command(self):
+        with self._queue_lock:
+            func, args, enqueued_at = self._commands.popleft()
 
-                # Always trigger a fresh suggestion after user input
-                self.awaiting_result = False
+        profile = self._profile
+        started = time.time()
+        try:
+            with self._optimizer_lock, profile or NOT_PROFILING:
+                func(*args)
+                self._maybe_flush()
+        except Exception:
+            print("[EXCEPTION TRACEBACK]")
+            traceback.print_exc()
+        finally:
+            wait_ms = (started - enqueued_at) * 1000.0
+            with self._queue_lock:
+                self.queue_stats["processed"] += 1
+                self.queue_stats["last_wait_ms"] = round(wait_ms, 1)
+                self.queue_stats["max_wait_ms"] = round(max(self.queue_stats["max_wait_ms"], wait_ms), 1)
+                self.queue_stats["last_run_ms"] = round((time.time() - started) * 1000.0, 1)
+            METRICS.observe("queue_wait", wait_ms)
+            METRICS.observe("command", (time.time() - started) * 1000.0)
+            # Timer-driven checkpoints change nothing platform_status shows
+            if func != self._maybe_checkpoint:
+                self.notify()
+        with self._optimizer_lock:
+            # Group commit: one fsync for everything the command journaled
+            if self.journal is not None:
+                self.journal.sync()
+            self._maybe_checkpoint()
+        if profile is not None and profile.done():
+            self._stop_profile(profile)
 
-                self.send_suggestion()
-                self.publish_optimizer_state()              
+        # Reschedule rather than loop so a shared executor interleaves hosts
+        with self._queue_lock:
+            if not self._commands:
+                self._worker_scheduled = False
+                return
+        self.executor.submit(self._run_next_command)
+
+    def _handle_profile_request(self, request):
+        # Normalized by utils.schemas.check_profile
+        if request["action"] == "stop":
+            if self._profile is None:
+                print("[PROFILE] No profiling session running.")
+            else:
+                self._stop_profile(self._profile)
+            return
+        if self._profile is not None:
+            self.mqtt_handler.publish("status", {"status": "profile_busy", "mode": self._profile.mode})
+            return
+
+        iterations = request.get("iterations")
+        seconds = request.get("seconds")
+        session = ProfilingSession(
+            self.address,
+            mode=request.get("mode", "cpu"),
+            iterations=int(iterations) if iterations is not None else None,
+            seconds=float(seconds) if seconds is not None else None,
+            top=request.get("top", 15),
+            output_dir=self.profile_dir,
+        )
+        session.start()
+        self._profile = session
+        if session.seconds is not None:
+            # Ends a time-boxed session even if the bay is idle
+            self.call_later(session.seconds, self._stop_profile, session)
+        print(f"[PROFILE] Profiling started: mode={session.mode}, iterations={session.iterations}, seconds={session.seconds}")
+        self.mqtt_handler.publish("status", {
+            "status": "profiling",
+            "mode": session.mode,
+            "iterations": session.iterations,
+            "seconds": session.seconds,
+        })
+
+    def _stop_profile(self, session):
+        with self._queue_lock:
+            if self._profile is not session:
+                return  # Already stopped by the other trigger
+            self._profile = None
+        # Written on the worker, after whatever command is running now
+        self.enqueue(self._finish_profile, session)
+
+    def _finish_profile(self, session):
+        try:
+            report = session.finish()
+        except Exception as e:
+            print(f"[PROFILE] Failed to write profile: {e}")
+            self.mqtt_handler.publish("status", {"status": "profile_failed", "error": str(e)})
+            return
+        print(f"[PROFILE] Profile written to {', '.join(report['files'])}")
+        self.mqtt_handler.publish("status", {"status": "profile_report", **report}, retain=False)
 
+    def _is_mutation(self, command):
+        func, args, _ = command
+        return func == self._dispatch and args[0] in ("result", "data_in")
 
+    def _mark_dirty(self):
+        now = time.time()
+        if self._dirty_since is None:
+            self._dirty_since = now
+            self._dirty_epoch = self._run_epoch
+        self._last_mutation = now
+
+    def _maybe_flush(self):
+        if self._dirty_since is None:
+            return
+        now = time.time()
+        deadline = self._dirty_since + self.coalesce_max_delay
+        if now < deadline:
+            with self._queue_lock:
+                more = any(self._is_mutation(c) for c in self._commands)
+            if more:
+                return  # Flushed after the queued result/edit instead
+            wait = min(self._last_mutation + self.coalesce_window, deadline) - now
+            if wait > 0:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                self._flush_timer = self.call_later(wait, self.enqueue, self._maybe_flush)
+                return
+
+        self._dirty_since = None
+        try:
+            # The next batch is generated once every outstanding trial is back,
+            # unless the trigger went off (or off and on) since the first change
+            running = self.platform_running and self._dirty_epoch == self._run_epoch
+            if running and not self.pending_trials:
+                self.send_suggestion()
+            self.publish_optimizer_state()
         except Exception as e:
             print("[EXCEPTION TRACEBACK]")
             traceback.print_exc()
+            self.mqtt_handler.publish("status", {"status": "error", "message": str(e)})
+
+    def _on_setup(self, config):
+        self._journal("setup", config=config)
+        if self._load_config(config):
+            self.mqtt_handler.publish("status", {"status": "setup_config_loaded", "resumed": True})
+            return
+        self.mqtt_handler.publish("status", {"status": "setup_config_loaded"})
+        # Optional warm start from earlier campaigns: trials inline or a file path
+        if config.get("warm_start"):
+            self._load_history(config["warm_start"])
+        self.publish_snapshot()
+
+    def _on_tagmap(self, mapping):
+        self._journal("tagmap", tag_map=mapping)
+        self.tag_map = mapping
+        self.mqtt_handler.publish("status", {"status": "tagmap_loaded"})
+
+    def _on_input(self, entries):
+        if not self.platform_running:
+            self.mqtt_handler.publish("status", {"status": "platform_idle", "message": "Not running"})
+            return
+
+        for entry in entries:
+            parameters = entry["parameters"]
+            # Our own suggestions echo back here; anything else is a manual input
+            if self._match_pending(parameters, entry["trial_index"]) is None:
+                if self.batch_size == 1 and self.pending_trials:
+                    self._abandon_trials(list(self.pending_trials))
+                    self.pending_trials = {}
+                self._journal("manual_input", parameters=parameters)
+                idx = self.optimizer.attach_running_trial(parameters)
+                self.pending_trials[idx] = parameters
+                self._touched_trials.add(idx)
+            self.mqtt_handler.publish("status", {"status": "input_received", "parameters": parameters})
+
+    def _on_result(self, result):
+        # Pending trials are only released by _stop_run, so a result queued
+        # before a trigger-off (or recovered after a crash) still applies
+        if not self.awaiting_result:
+            self.mqtt_handler.publish("status", {"status": "platform_idle", "message": "Not awaiting result"})
+            return
+
+        result_parameters, metrics = result["parameters"], result["metrics"]
+        # Results may arrive in any order when several trials are outstanding
+        pending_idx = self._match_pending(result_parameters, result["trial_index"])
+        self._journal("result", sync=True, received=self._receipt, parameters=result_parameters,
+                      metrics=metrics, pending_index=pending_idx, trial_index=pending_idx)
+        if pending_idx is not None:
+            # Completed by index: another trial may share its rounded parameters
+            idx = self.optimizer.complete_or_attach_trial(result_parameters, metrics, trial_index=pending_idx)
+            self.pending_trials.pop(pending_idx, None)
+            self._touched_trials.add(idx)
+            self._check_speculation(pending_idx, metrics)
+            self.mqtt_handler.publish("status", {"status": "trial_completed", "trial_index": idx})
+        else:
+            # The pre-generated candidate assumed the suggested point was pending
+            self._speculation = None
+            idx = self.optimizer.complete_or_attach_trial(result_parameters, metrics)
+            self._touched_trials.add(idx)
+            if self.batch_size == 1:
+                self._abandon_trials(list(self.pending_trials))
+                self.pending_trials = {}
+            self.mqtt_handler.publish("status", {"status": "user_override", "trial_index": idx})
+
+        # State publish and the next suggestion are coalesced across a burst
+        self._mark_dirty()
+
+    def _on_data_in(self, trials):
+        if not self.optimizer:
+            self.mqtt_handler.publish("status", {"status": "error", "message": "Optimizer not initialized."})
+            return
+
+        # Rows without a trial_index are compared with the trial they match, if any
+        trials = [
+            t if t.get("trial_index") is not None
+            else dict(t, trial_index=self.optimizer.find_trial(t["parameters"]))
+            for t in trials
+        ]
+        # Every edited row is applied before a single refit/suggestion
+        changed = detect_trial_changes(trials, self.optimizer.summarize(), self.optimizer.change_tolerances())
+        if not changed:
+            self.mqtt_handler.publish("status", {"status": "no_changes"})
+            return
+
+        self._speculation = None
+        updates = []
+        for matched_idx, changes, trial in changed:
+            parameters = trial["parameters"]
+            metrics = trial.get("metrics", {})
+
+            # Complete the edited row's own trial (or the pending one it matches);
+            # a row whose parameters changed becomes a new trial
+            edited_parameters = any(name in parameters for name in changes)
+            pending_idx = self._match_pending(parameters, None if edited_parameters else matched_idx)
+            target = pending_idx if pending_idx is not None or edited_parameters else matched_idx
+            self._journal("manual_update", sync=True, received=self._receipt, parameters=parameters,
+                          metrics=metrics, pending_index=pending_idx, trial_index=target)
+            idx = self.optimizer.complete_or_attach_trial(parameters, metrics, trial_index=target)
+            self._touched_trials.add(idx)
+            self.pending_trials.pop(pending_idx, None)
+            action = "manual_update" if matched_idx is not None else "manual_injection"
+            updates.append({"status": action, "trial_index": idx, "changes": changes})
+
+        # Any suggestion still outstanding is superseded by the manual input
+        if self.pending_trials:
             self.mqtt_handler.publish("status", {
-                "status": "error",
-                "message": str(e)
+                "status": "awaiting_result_abandoned",
+                "message": "New manual input received. Previous suggestion abandoned.",
+                "abandoned_trials": [
+                    {"trial_index": i, "parameters": p} for i, p in self.pending_trials.items()
+                ],
             })
+            self._abandon_trials(list(self.pending_trials))
+
+        for update in updates:
+            self.mqtt_handler.publish("status", update)
+
+        # Always trigger a fresh suggestion after user input
+        self.pending_trials = {}
+        self._mark_dirty()
+
+    def _on_data_request(self, _):
+        self.publish_snapshot()
+
+    def _on_history(self, source):
+        if not self.optimizer:
+            self.mqtt_handler.publish("status", {"status": "error", "message": "Optimizer not initialized."})
+            return
+        self._load_history(source)
+        self.publish_snapshot()
+
+    def _readiness_changed(self):
+        # A trigger that arrived before setup/tagmap starts the run right here
+        self._config_ready = None
+        self.check_trigger()
 
     def start(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            self.mqtt_handler.publish("status", {"status": "stopped"})
+            self.mqtt_handler.stop()
+
+    async def serve(self):
+        # Event-driven core: MQTT callbacks, optimizer commands and timers wake
+        # this loop through notify()/call_later(); nothing polls. Come online
+        # first; Ax/torch load in the background and the checkpoint is restored
+        # ahead of any optimizer message that arrives meanwhile.
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        loader.start_background_load()
+        self.enqueue_when_ready(self.restore_checkpoint)
         self.mqtt_handler.set_message_callback(self.handle_message)
         self.mqtt_handler.connect()
-        self.mqtt_handler.client.loop_start()
-        self.mqtt_handler.publish("status", {"status": "idle_waiting"})
-        threading.Thread(target=self.status_loop, daemon=True).start()
+        self.mqtt_handler.publish("status", {"status": "idle_waiting", "optimizer_ready": loader.is_ready()})
 
-        try:
-            while True:
-                if self.config_ready and self.trigger_flag and not self.platform_running:
-                    self.platform_running = True
-                    self.mqtt_handler.publish("status", {"status": "running"})
-                    self.send_suggestion()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.status_heartbeat)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self.status_event.clear()
+            # Best-parameter lookups may fit a model; keep them off the loop
+            await self._loop.run_in_executor(None, self._status_tick)
 
-                elif self.platform_running and not self.trigger_flag:
-                    self.platform_running = False
-                    self.mqtt_handler.publish("status", {"status": "waiting_trigger"})
+    def notify(self):
+        # Wakes the status publisher: the asyncio core, or status_loop threads
+        self.status_event.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
 
-                time.sleep(1)
-        except KeyboardInterrupt:
-            self.mqtt_handler.publish("status", {"status": "stopped"})
-            self.mqtt_handler.client.loop_stop()
+    def call_later(self, delay, func, *args):
+        # Timer on the asyncio core when it is running, else a daemon thread.
+        # Either way the result has cancel().
+        if self._loop is None:
+            timer = threading.Timer(delay, func, args=args)
+            timer.daemon = True
+            timer.start()
+            return timer
+        return LoopTimer(self._loop, delay, func, *args)
+
+    def check_trigger(self):
+        if self.config_ready and self.trigger_flag and not self.platform_running:
+            self.platform_running = True
+            self.mqtt_handler.publish("status", {"status": "running"})
+            self.enqueue(self._start_run)
+            self.notify()
+
+        elif self.platform_running and not self.trigger_flag:
+            self.platform_running = False
+            self._run_epoch += 1
+            self.enqueue(self._stop_run)
+            self.mqtt_handler.publish("status", {"status": "waiting_trigger"})
+            self.notify()
 
     def status_loop(self):
+        # Thread-based alternative to serve() for embedding (benchmarks, tests)
         while True:
-            best_params, best_metrics, best_trial_index, best_arm_name = None, None, None, None
-            model_used = False
+            self.status_event.wait(timeout=self.status_heartbeat)
+            self.status_event.clear()
+            self._status_tick()
+
+    def _status_tick(self):
+        # A failed publish must not end serve()/status_loop; the next tick retries
+        try:
+            self.publish_platform_status()
+            self.publish_metrics()
+        except Exception:
+            print("[EXCEPTION TRACEBACK]")
+            traceback.print_exc()
 
-            if self.optimizer:
+    def publish_metrics(self, force=False):
+        now = time.time()
+        if not force and (not self.metrics_interval or now - self._last_metrics_time < self.metrics_interval):
+            return
+        self._last_metrics_time = now
+        self.mqtt_handler.publish("metrics", dict(METRICS.snapshot(), timestamp=now), retain=False)
+
+    def publish_platform_status(self):
+        best_params, best_metrics, best_trial_index, best_arm_name = None, None, None, None
+        model_used = False
+
+        # Runs beside the worker, which mutates pending trials and model info:
+        # copy them under the optimizer lock. Never wait behind a model fit;
+        # reuse the last copy while the worker is busy.
+        if self.optimizer and self._optimizer_lock.acquire(blocking=False):
+            try:
+                pending, model = sorted(self.pending_trials), dict(self.optimizer.model_info)
                 try:
                     best = self.optimizer.get_best_parameters()
-                    if best:
-                        best_params, best_metrics, best_trial_index, best_arm_name = best
-                        # Check if any metric is NaN, implying fallback to raw observed data or model failure
-                        if best_metrics and isinstance(best_metrics, dict):
-                            model_used = not any(
-                                isinstance(v, float) and np.isnan(v)
-                                or (isinstance(v, tuple) and any(np.isnan(x) for x in v))
-                                for v in best_metrics.values()
-                            )
                 except Exception as e:
+                    best = None
                     print(f"[WARNING] Failed to get best parameterization: {e}")
+                self._last_optimizer_view = (best, pending, model)
+            finally:
+                self._optimizer_lock.release()
+        elif self.optimizer:
+            best, pending, model = self._last_optimizer_view
+        else:
+            best, pending, model = None, [], None
 
-            status = {
-                "running": self.platform_running,
-                "config_ready": self.config_ready,
-                "awaiting_result": self.awaiting_result,
-                "timestamp": time.time(),
-                "best_suggestion": best_params,
-                "best_estimation": best_metrics,
-                "best_trial_index": best_trial_index,
-                "best_arm_name": best_arm_name,
-                "model_used_in_best_estimation": model_used,
-            }
+        if best:
+            best_params, best_metrics, best_trial_index, best_arm_name = best
+            # Check if any metric is NaN, implying fallback to raw observed data or model failure
+            if best_metrics and isinstance(best_metrics, dict):
+                model_used = not any(
+                    isinstance(v, float) and np.isnan(v)
+                    or (isinstance(v, tuple) and any(np.isnan(x) for x in v))
+                    for v in best_metrics.values()
+                )
 
-            self.mqtt_handler.publish("platform_status", status)
+        with self._queue_lock:
+            command_queue = dict(self.queue_stats, depth=len(self._commands), deferred=len(self._deferred))
+        status = {
+            "running": self.platform_running,
+            "config_ready": self.config_ready,
+            "awaiting_result": bool(pending),
+            "pending_trials": pending,
+            "best_suggestion": best_params,
+            "best_estimation": best_metrics,
+            "best_trial_index": best_trial_index,
+            "best_arm_name": best_arm_name,
+            "model_used_in_best_estimation": model_used,
+            "model": model,
+            "command_queue": command_queue,
+            "outbound_queue": self.mqtt_handler.outbound_status(),
+            "optimizer_ready": loader.is_ready(),
+            "import_timings": loader.get_timings(),
+        }
 
-            time.sleep(5)
+        # Skip identical payloads unless the heartbeat is due. Queue counters move
+        # with every command and publish (this one included), so they ride along
+        # without counting as a change.
+        now = time.time()
+        fingerprint = json.dumps({k: v for k, v in status.items() if k not in VOLATILE_STATUS_KEYS},
+                                 sort_keys=True, default=str)
+        if fingerprint == self._last_status and now - self._last_status_time < self.status_heartbeat:
+            return
+        self._last_status = fingerprint
+        self._last_status_time = now
+
+        status["timestamp"] = now
+        self.mqtt_handler.publish("platform_status", status)
 
     def send_suggestion(self):
         if not self.optimizer:
@@ -263,55 +798,292 @@ class OptimizationHost:
         #     print("[SUGGESTION] Awaiting result from last trial. Not suggesting new one.")
         #     return
 
-        trial_index, suggestion = self.optimizer.suggest_next()
-        if suggestion:
-            # Round all float values to 2 decimal places
-            rounded_suggestion = {
-            k: round(v, 2) if isinstance(v, float) else v
-            for k, v in suggestion.items()
-             }
-            self.last_suggestion = rounded_suggestion
-            self.awaiting_result = True
-            self.mqtt_handler.publish("input", rounded_suggestion)
+        epoch = self._run_epoch
+        speculation, self._speculation = self._speculation, None
+        if speculation is not None and speculation["epoch"] == epoch:
+            print("[SUGGESTION] Serving pre-generated candidate.")
+            trials = self.optimizer.attach_generated(speculation["candidates"])
+        else:
+            trials = self.optimizer.suggest_batch(self.batch_size)
+        # Journaled before the epoch check so a following abandon replays cleanly
+        self._journal("suggestion", trials={
+            str(idx): self.optimizer.round_parameters(params) for idx, params in trials.items()
+        })
+        if epoch != self._run_epoch:
+            print("[SUGGESTION] Trigger turned off during generation. Discarding suggestion.")
+            self._abandon_trials(list(trials))
+            self.publish_optimizer_state()
+            return
+        if trials:
+            # Publish at the same per-parameter resolution used for matching
+            for trial_index, suggestion in trials.items():
+                self.pending_trials[trial_index] = self.optimizer.round_parameters(suggestion)
+                self._touched_trials.add(trial_index)
+            self._publish_input(list(trials))
             # Publish optimizer state to data topic
             self.publish_optimizer_state()
+            if self._profile is not None:
+                self._profile.completed_iterations += 1
+            if self.speculative:
+                self.enqueue(self._speculate)
+
+    def _publish_input(self, trial_indices):
+        if self.batch_size == 1:
+            self.mqtt_handler.publish("input", self.pending_trials[trial_indices[-1]])
+        else:
+            self.mqtt_handler.publish("input", {"trials": [
+                {"trial_index": idx, "parameters": self.pending_trials[idx]} for idx in trial_indices
+            ]})
+
+    def _start_run(self):
+        # After a restart the line may still be working on restored trials
+        if self.pending_trials:
+            print("[SUGGESTION] Resuming outstanding trials.")
+            self._publish_input(sorted(self.pending_trials))
+        else:
+            self.send_suggestion()
+
+    def _stop_run(self):
+        # Queued behind the messages that arrived before the trigger went off,
+        # so a result already in the queue still completes its trial
+        pending, self.pending_trials = self.pending_trials, {}
+        if pending:
+            self._abandon_trials(list(pending))
+
+    def _speculate(self):
+        # Queued behind the suggestion it follows, so it runs while the line
+        # works on that trial and finishes before its result is processed.
+        if not (self.optimizer and self.platform_running and self.awaiting_result) or self._speculation:
+            return
+        epoch = self._run_epoch
+        pending = sorted(self.pending_trials)
+        candidates, predictions = self.optimizer.speculate(self.batch_size, pending)
+        if epoch == self._run_epoch:
+            self._speculation = {
+                "epoch": epoch,
+                "candidates": candidates,
+                "predictions": predictions,
+                "incumbent": self.optimizer.best_observed(),
+            }
+
+    def _check_speculation(self, trial_index, metrics):
+        # The pre-generated candidate is only as good as the model's view of the
+        # pending trial: drop it when the result falls outside the predictive
+        # interval there, or beats the incumbent, so the next one is regenerated
+        speculation = self._speculation
+        value = self.optimizer.objective_value(metrics)
+        # No predictions: the candidate came from a model-free step (Sobol)
+        if speculation is None or speculation["predictions"] is None or value is None:
+            return
+        predicted = speculation["predictions"].get(trial_index)
+        incumbent = speculation["incumbent"]
+        reason = None
+        if predicted is not None and abs(value - predicted[0]) > self.speculation_z * predicted[1]:
+            reason = f"outside the predicted {predicted[0]:.4g} +/- {self.speculation_z * predicted[1]:.4g}"
+        elif incumbent is not None and (value < incumbent if self.optimizer.minimize else value > incumbent):
+            reason = f"better than the incumbent {incumbent:.4g}"
+        if reason:
+            print(f"[SUGGESTION] Result of trial {trial_index} ({value:.4g}) is {reason}; "
+                  f"discarding the pre-generated candidate.")
+            METRICS.incr("speculation_discarded")
+            self._speculation = None
+
+    def _load_config(self, config):
+        # The retained setup is redelivered on every reconnect; keep the trials
+        # unless the experiment definition actually changed
+        if self.optimizer and same_experiment(config, self.optimizer.config):
+            self.optimizer.update_config(config)
+            self._apply_config(config)
+            return True
+
+        from core.optimizer import BayesianOptimizer
+        if self.optimizer:
+            self.optimizer.close()
+        self.optimizer = BayesianOptimizer(config, status_callback=self._optimizer_status)
+        self._published_trials = {}
+        self._published_version = 0
+        self._touched_trials = set()
+        self._speculation = None
+        self._dirty_since = None
+        self.pending_trials = {}
+        self._apply_config(config)
+        return False
+
+    def _load_history(self, source):
+        # Validated rows are journaled, not the source, so replay never needs the file
+        history, rejected = self.optimizer.validate_history(source)
+        self._journal("history", trials=history.to_dict("records"))
+        indices = self.optimizer.attach_history(history)
+        self._speculation = None
+        self.mqtt_handler.publish("status", {
+            "status": "history_loaded",
+            "loaded": len(indices),
+            "rejected": rejected,
+        })
+
+    def _maybe_checkpoint(self, timer_fired=False):
+        if timer_fired:
+            self._checkpoint_timer = None
+        if not self.checkpoint_dir or not self.optimizer:
+            return
+        behind = self.journal.seq - self._checkpoint_seq
+        if behind <= 0:
+            return
+        due_in = self._last_checkpoint_time + self.checkpoint_interval - time.time()
+        if behind < self.checkpoint_every and due_in > 0:
+            # One timer saves the events held back by checkpoint_interval_s
+            if self._checkpoint_timer is None:
+                self._checkpoint_timer = self.call_later(due_in, self.enqueue, self._maybe_checkpoint, True)
+            return
+        try:
+            self.save_checkpoint()
+        except Exception as e:
+            print(f"[CHECKPOINT] Failed to save checkpoint: {e}")
+
+    def save_checkpoint(self):
+        with self._inbox_lock:
+            seq = self.journal.seq
+            inbox = [[receipt, suffix, payload] for receipt, (suffix, payload) in sorted(self._inbox.items())]
+        write_json_atomic(checkpoint_path(self.checkpoint_dir, self.address), {
+            "address": self.address,
+            "saved_at": time.time(),
+            "journal_seq": seq,
+            "tag_map": self.tag_map,
+            "pending_trials": {str(idx): params for idx, params in self.pending_trials.items()},
+            "data_seq": self.data_seq,
+            "inbox": inbox,
+            "optimizer": self.optimizer.to_snapshot(),
+        })
+        # Everything up to seq is in the checkpoint now
+        self.journal.compact(seq)
+        self._checkpoint_seq = seq
+        self._last_checkpoint_time = time.time()
+
+    def restore_checkpoint(self):
+        if not self.checkpoint_dir:
+            return False
+        from core.optimizer import BayesianOptimizer
+        path = checkpoint_path(self.checkpoint_dir, self.address)
+        try:
+            state = read_json(path) or {}
+            if state:
+                self.optimizer = BayesianOptimizer.from_snapshot(state["optimizer"], status_callback=self._optimizer_status)
+        except Exception as e:
+            print(f"[CHECKPOINT] Could not restore {path}: {e}")
+            return False
+
+        self._checkpoint_seq = state.get("journal_seq", 0)
+        self.tag_map = state.get("tag_map", {})
+        self.pending_trials = {int(idx): params for idx, params in state.get("pending_trials", {}).items()}
+        self.data_seq = state.get("data_seq", 0)
+        with self._inbox_lock:
+            for receipt, suffix, payload in state.get("inbox", []):
+                self._inbox.setdefault(receipt, (suffix, payload))
+
+        # Replay only what happened after the checkpoint
+        replayed = 0
+        for record in self.journal.read_after(self._checkpoint_seq):
+            try:
+                self._replay(record)
+                replayed += 1
+            except Exception as e:
+                print(f"[JOURNAL] Could not replay event {record.get('seq')} ({record.get('event')}): {e}")
+        if not self.optimizer:
+            return False
+
+        self._apply_config(self.optimizer.config)
+        print(f"[CHECKPOINT] Restored {len(self.optimizer.trial_table)} trials for {self.address} "
+              f"({replayed} journal events replayed)")
+        self._readiness_changed()
+        # Results/edits received before the crash but never handled go through
+        # the normal handlers now; later receipts are already queued
+        with self._inbox_lock:
+            recovered = sorted(r for r in self._inbox.items() if r[0] <= self._recover_upto)
+        for receipt, (suffix, payload) in recovered:
+            print(f"[JOURNAL] Redispatching unhandled {suffix} message {receipt}")
+            self.enqueue(self._dispatch, suffix, payload, receipt)
+        return True
+
+    def _replay(self, record):
+        # Mirrors the live handlers without publishing or generating
+        event = record["event"]
+        if event == "setup":
+            self._load_config(record["config"])
+        elif event == "tagmap":
+            self.tag_map = record["tag_map"]
+        elif event == "suggestion":
+            for idx, params in record["trials"].items():
+                self._replay_attach(int(idx), params)
+        elif event == "manual_input":
+            self._replay_attach(None, record["parameters"])
+        elif event in ("result", "manual_update"):
+            self.optimizer.complete_or_attach_trial(record["parameters"], record["metrics"],
+                                                    trial_index=record.get("trial_index"))
+            self.pending_trials.pop(record.get("pending_index"), None)
+        elif event == "history":
+            self.optimizer.load_history(record["trials"])
+        elif event == "abandon":
+            for idx in record["trial_indices"]:
+                self.optimizer.abandon_trial(idx)
+                self.pending_trials.pop(idx, None)
+        elif event == "received":
+            with self._inbox_lock:
+                self._inbox.setdefault(record["seq"], (record["topic"], record["payload"]))
+        if record.get("received") is not None:
+            with self._inbox_lock:
+                self._inbox.pop(record["received"], None)
+
+    def _replay_attach(self, expected_idx, params):
+        idx = self.optimizer.attach_running_trial(params)
+        if expected_idx is not None and idx != expected_idx:
+            print(f"[JOURNAL] Replayed trial {expected_idx} as {idx}")
+        self.pending_trials[idx] = params
 
     def _optimizer_status(self, msg):
         self.mqtt_handler.publish("platform_status", msg)
     
     def publish_optimizer_state(self):
+        # Delta publish: only trials the host touched since the last publish,
+        # tagged with a monotonically increasing sequence number.
         if not self.optimizer:
             self.mqtt_handler.publish("data", {"error": "Optimizer not initialized."})
             return
+        if not self._touched_trials:
+            return
 
         try:
-            df = self.optimizer.custom_summarize()
-            trial_array = df.values
-            # Get parameter and metric names from the experiment definition
-            param_names = [p.name for p in self.optimizer.client._experiment.search_space.parameters.values()]
-            metric_names = list(self.optimizer.client._experiment.metrics.keys())
-            trial_list = []
-            for row in trial_array:
-                trial_dict = {}
-                parameters = {}
-                metrics = {}
-                
-                for col, val in zip(df.columns, row):
-                    if isinstance(val, float):
-                        val = round(val, 2)
-                    if col in param_names:
-                        parameters[col] = val
-                    elif col in metric_names:
-                        metrics[col] = val
-                    else:
-                        trial_dict[col] = val
-                
-                trial_dict["parameters"] = parameters
-                trial_dict["metrics"] = metrics
-                trial_list.append(trial_dict)
-
-            self.mqtt_handler.publish("data", {"trials": trial_list})
+            touched = sorted(self._touched_trials)
+            self._touched_trials = set()
+            records = self.optimizer.trial_records(touched)
+            for record in records:
+                self._published_trials[record["trial_index"]] = record
+
+            self.data_seq += 1
+            self.mqtt_handler.publish("data", {"seq": self.data_seq, "type": "delta", "trials": records}, retain=False)
+
+            self._deltas_since_snapshot += 1
+            if self._deltas_since_snapshot >= self.snapshot_interval:
+                self.publish_snapshot()
 
         except Exception as e:
             self.mqtt_handler.publish("data", {"error": str(e)})
 
+    def publish_snapshot(self):
+        # Full retained trial list so late subscribers can resync, stamped with
+        # the sequence number of the last delta it includes.
+        if not self.optimizer:
+            self.mqtt_handler.publish("data_snapshot", {"error": "Optimizer not initialized."})
+            return
+
+        try:
+            changed = self.optimizer.changed_trials(self._published_version)
+            for record in self.optimizer.trial_records(changed):
+                self._published_trials[record["trial_index"]] = record
+            self._published_version = self.optimizer.table_version
+            trial_list = [self._published_trials[idx] for idx in sorted(self._published_trials)]
+
+            self.mqtt_handler.publish("data_snapshot", {"seq": self.data_seq, "type": "snapshot", "trials": trial_list})
+            self._deltas_since_snapshot = 0
+
+        except Exception as e:
+            self.mqtt_handler.publish("data_snapshot", {"error": str(e)})
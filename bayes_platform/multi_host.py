@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from bayes_platform.host import OptimizationHost, BROKER_SETTINGS
+from core import loader
+from mqtt.mqtt_handler import MQTTHandler
+from utils.metrics import METRICS
+from utils.persistence import read_json
+
+
+class MultiBayHost:
+    def __init__(self, address_pattern="LC/+/+/+/bay", max_workers=4, checkpoint_dir="checkpoints",
+                 metrics_topic="LC/platform/metrics", metrics_interval=30.0):
+        self.address_pattern = address_pattern
+        self.checkpoint_dir = checkpoint_dir
+        self.bays = {}
+        self._bays_lock = threading.Lock()
+        # Any bay changing state wakes the shared status loop
+        self.status_event = threading.Event()
+
+        # Bays share one broker connection and a bounded pool of optimizer workers.
+        # Each bay drains its queue one command per pool task, so busy bays take
+        # turns instead of monopolizing the pool.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optimizer")
+        # One subscription per routed suffix: a bay-level wildcard would also
+        # deliver every bay's own output (data_snapshot, platform_status, ...)
+        subscriptions = {suffix: f"{address_pattern}/{suffix}" for suffix in OptimizationHost.ROUTES}
+        self.mqtt_handler = MQTTHandler(topics=subscriptions, **BROKER_SETTINGS)
+        # Stage metrics are process-wide, so they go out once rather than per bay
+        self.metrics_topic = metrics_topic
+        self.metrics_interval = metrics_interval
+        self._last_metrics_time = 0.0
+
+    def get_bay(self, address):
+        with self._bays_lock:
+            bay = self.bays.get(address)
+            if bay is None:
+                print(f"[MULTI] New bay context: {address}")
+                bay = OptimizationHost(
+                    address,
+                    executor=self.executor,
+                    mqtt_handler=self.mqtt_handler,
+                    status_event=self.status_event,
+                    checkpoint_dir=self.checkpoint_dir,
+                )
+                bay.enqueue_when_ready(bay.restore_checkpoint)
+                bay.mqtt_handler.publish("status", {"status": "idle_waiting"})
+                self.bays[address] = bay
+            return bay
+
+    def handle_message(self, topic, payload):
+        address, _, suffix = topic.rpartition("/")
+        # Subscribed per routed suffix; anything else is not for a bay
+        if suffix not in OptimizationHost.ROUTES:
+            return
+        self.get_bay(address).handle_message(topic, payload)
+
+    def restore_bays(self):
+        # Bring every checkpointed bay back before the first message arrives
+        if not self.checkpoint_dir or not os.path.isdir(self.checkpoint_dir):
+            return
+        for name in sorted(os.listdir(self.checkpoint_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                state = read_json(os.path.join(self.checkpoint_dir, name))
+            except Exception as e:
+                print(f"[CHECKPOINT] Skipping {name}: {e}")
+                continue
+            if state and state.get("address"):
+                self.get_bay(state["address"])
+
+    def start(self):
+        loader.start_background_load()
+        self.restore_bays()
+        self.mqtt_handler.set_message_callback(self.handle_message)
+        self.mqtt_handler.connect()
+        threading.Thread(target=self.status_loop, daemon=True).start()
+
+        # Bays start runs themselves when trigger, setup and tagmap line up
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            for bay in list(self.bays.values()):
+                bay.mqtt_handler.publish("status", {"status": "stopped"})
+            self.mqtt_handler.stop()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def status_loop(self):
+        # Woken by any bay's notify(); otherwise sleeps until the next bay
+        # heartbeat or metrics publish is due
+        while True:
+            self.status_event.wait(timeout=self._next_due())
+            self.status_event.clear()
+            # A failed publish must not end the loop for every bay
+            try:
+                for bay in list(self.bays.values()):
+                    bay.publish_platform_status()
+                now = time.time()
+                if self.metrics_topic and self.metrics_interval and now - self._last_metrics_time >= self.metrics_interval:
+                    self._last_metrics_time = now
+                    self.mqtt_handler.publish_to(self.metrics_topic, dict(METRICS.snapshot(), timestamp=now),
+                                                 retain=False)
+            except Exception:
+                print("[EXCEPTION TRACEBACK]")
+                traceback.print_exc()
+
+    def _next_due(self):
+        now = time.time()
+        due = [bay._last_status_time + bay.status_heartbeat - now for bay in list(self.bays.values())]
+        if self.metrics_topic and self.metrics_interval:
+            due.append(self._last_metrics_time + self.metrics_interval - now)
+        return max(0.05, min(due, default=60.0))
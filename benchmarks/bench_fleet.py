@@ -0,0 +1,131 @@
+"""
+Closed-loop stress test: N simulated granulation bays served by one
+MultiBayHost over the in-process broker, compared by time-to-target.
+
+    python -m benchmarks.bench_fleet --bays 6 --speedup 600 --target 9 \
+        --settings '[{"speculative": false}, {"speculative": true}]'
+
+Bays cycle through --settings (setup overrides). Writes one JSON line per bay
+and a summary line per settings group.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.fake_broker import FakeBroker
+from bayes_platform.multi_host import MultiBayHost
+from core import loader
+from simulator.granulation import GranulationProcess, SimulatedBay
+from utils.data_handler import load_default_config
+
+
+def run(args, out):
+    settings = json.loads(args.settings)
+    broker = FakeBroker()
+    host = MultiBayHost(address_pattern="SIM/+/bay", max_workers=args.workers, checkpoint_dir=None)
+    host_client = broker.client()
+    host_client.on_connect = host.mqtt_handler._on_connect
+    host_client.on_message = host.mqtt_handler._on_message
+    host.mqtt_handler.client = host_client
+
+    started = time.time()
+    loader.start_background_load()
+    host.mqtt_handler.set_message_callback(host.handle_message)
+    host.mqtt_handler.connect()
+    threading.Thread(target=host.status_loop, daemon=True).start()
+
+    sims = []
+    for i in range(args.bays):
+        address = f"SIM/{i:03d}/bay"
+        overrides = settings[i % len(settings)]
+        seed = args.seed + i
+        client = broker.client()
+        client.connect()
+        sim = SimulatedBay(client, address, GranulationProcess(noise=args.noise, seed=seed),
+                           duration_s=args.duration_s, speedup=args.speedup, target=args.target, seed=seed)
+        sim.settings = overrides
+        sim.start()
+        config = dict(load_default_config(), **overrides)
+        client.publish(address + "/setup", json.dumps(config), retain=True)
+        client.publish(address + "/tagmap", json.dumps({p["name"]: p["name"] for p in config["parameters"]}), retain=True)
+        client.publish(address + "/python", json.dumps(True), retain=True)
+        sims.append(sim)
+
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        active = [s for s in sims if not s.stopped]
+        for sim in active:
+            if sim.reached.is_set() or sim.completed >= args.max_trials:
+                sim.stop()
+                sim.client.publish(sim.address + "/python", json.dumps(False), retain=True)
+        if not active:
+            break
+        time.sleep(0.05)
+
+    groups = {}
+    for sim in sims:
+        record = {
+            "type": "bay",
+            "address": sim.address,
+            "settings": sim.settings,
+            "reached": sim.time_to_target is not None,
+            "time_to_target": sim.time_to_target,
+            "trials": sim.completed,
+            "best": sim.best,
+        }
+        out.write(json.dumps(record) + "\n")
+        groups.setdefault(json.dumps(sim.settings, sort_keys=True), []).append(sim)
+
+    for key, group in groups.items():
+        reached = [s.time_to_target for s in group if s.time_to_target]
+        summary = {
+            "type": "summary",
+            "settings": json.loads(key),
+            "bays": len(group),
+            "reached": len(reached),
+            "median_trials_to_target": float(np.median([r["trials"] for r in reached])) if reached else None,
+            "median_sim_s_to_target": float(np.median([r["sim_s"] for r in reached])) if reached else None,
+            "median_wall_s_to_target": float(np.median([r["wall_s"] for r in reached])) if reached else None,
+            "target": args.target,
+            "speedup": args.speedup,
+            "wall_s": round(time.time() - started, 3),
+        }
+        out.write(json.dumps(summary) + "\n")
+    out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bays", type=int, default=4)
+    parser.add_argument("--settings", default="[{}]", help="JSON list of setup overrides, cycled over the bays")
+    parser.add_argument("--target", type=float, default=9.0, help="granule_quality_index to reach")
+    parser.add_argument("--max-trials", type=int, default=60)
+    parser.add_argument("--duration-s", type=float, default=600.0, help="simulated batch duration")
+    parser.add_argument("--speedup", type=float, default=600.0)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4, help="optimizer worker threads in the host")
+    parser.add_argument("--timeout", type=float, default=1800.0)
+    parser.add_argument("--out", default="-", help="JSON-lines output file, - for stdout")
+    parser.add_argument("--verbose", action="store_true", help="keep the host's own logging")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    if not args.verbose:
+        logging.disable(logging.INFO)
+        sys.stdout = open(os.devnull, "w")
+    try:
+        run(args, out)
+    finally:
+        if out is not sys.__stdout__:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+End-to-end benchmark of OptimizationHost: setup -> trigger -> result loops over
+the default granulation search space with a synthetic objective.
+
+    python -m benchmarks.bench_host --trials 300 --out bench.jsonl
+    python -m benchmarks.bench_host --broker localhost:1883   # real mosquitto
+
+Writes one JSON line per iteration and a final summary line.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.fake_broker import FakeBroker
+from bayes_platform.host import OptimizationHost
+from core import loader
+from utils.data_handler import load_default_config
+
+ADDRESS = "BENCH/bay"
+
+
+def _normalized(params, config):
+    return np.array([
+        (params[p["name"]] - p["lb"]) / (p["ub"] - p["lb"]) for p in config["parameters"]
+    ])
+
+
+def quadratic(u):
+    return -float(np.sum((u - 0.3) ** 2))
+
+
+def rosenbrock(u):
+    x = 4.0 * u - 2.0
+    return -float(np.sum(100.0 * (x[1:] - x[:-1] ** 2) ** 2 + (1.0 - x[:-1]) ** 2))
+
+
+OBJECTIVES = {"quadratic": quadratic, "rosenbrock": rosenbrock}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak rather than current RSS where /proc is unavailable
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = np.asarray(values, dtype=float)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+class Driver:
+    # Plays the line/HMI side: publishes setup, trigger and results, and records
+    # everything the host publishes under the bay address.
+    def __init__(self, client):
+        self.client = client
+        self.inputs = queue.Queue()
+        self.bytes = {}
+        self.last_size = {}
+        client.on_message = self._on_message
+
+    def start(self):
+        self.client.subscribe(ADDRESS + "/#")
+
+    def publish(self, suffix, data, retain=False):
+        self.client.publish(ADDRESS + "/" + suffix, json.dumps(data), retain=retain)
+
+    def _on_message(self, client, userdata, msg):
+        suffix = msg.topic.rpartition("/")[2]
+        self.bytes[suffix] = self.bytes.get(suffix, 0) + len(msg.payload)
+        self.last_size[suffix] = len(msg.payload)
+        if suffix == "input" and not msg.retain:
+            self.inputs.put((time.time(), json.loads(msg.payload)))
+
+
+def _make_clients(args, host):
+    if args.broker:
+        import paho.mqtt.client as mqtt
+        hostname, _, port = args.broker.partition(":")
+        host.mqtt_handler.broker = hostname
+        host.mqtt_handler.port = int(port or 1883)
+        client = mqtt.Client()
+        client.connect(hostname, int(port or 1883))
+        client.loop_start()
+        return client
+
+    broker = FakeBroker()
+    host_client = broker.client()
+    host_client.on_connect = host.mqtt_handler._on_connect
+    host_client.on_message = host.mqtt_handler._on_message
+    host.mqtt_handler.client = host_client
+    client = broker.client()
+    client.connect()
+    return client
+
+
+def run(args, out):
+    config = load_default_config()
+    config.update({"batch_size": 1, "speculative": args.speculative, "execution_backend": args.backend})
+    objective = OBJECTIVES[args.objective]
+    rng = np.random.default_rng(args.seed)
+
+    started = time.time()
+    host = OptimizationHost(address=ADDRESS, checkpoint_dir=args.checkpoint_dir)
+    driver = Driver(_make_clients(args, host))
+
+    # Time spent in send_suggestion on the host worker (generate + publish)
+    suggest_ms = []
+    send_suggestion = host.send_suggestion
+
+    def timed_send_suggestion():
+        t = time.perf_counter()
+        send_suggestion()
+        suggest_ms.append((time.perf_counter() - t) * 1000.0)
+    host.send_suggestion = timed_send_suggestion
+
+    loader.start_background_load()
+    if args.checkpoint_dir:
+        host.enqueue_when_ready(host.restore_checkpoint)
+    host.mqtt_handler.set_message_callback(host.handle_message)
+    host.mqtt_handler.connect()
+    online_s = time.time() - started
+    threading.Thread(target=host.status_loop, daemon=True).start()
+
+    driver.start()
+    driver.publish("setup", config, retain=True)
+    driver.publish("tagmap", {p["name"]: p["name"] for p in config["parameters"]}, retain=True)
+    driver.publish("python", True, retain=True)
+
+    received_at, params = driver.inputs.get(timeout=args.timeout)
+    summary = {
+        "type": "summary",
+        "trials": args.trials,
+        "objective": args.objective,
+        "backend": args.backend,
+        "speculative": args.speculative,
+        "broker": args.broker or "fake",
+        "online_s": round(online_s, 3),
+        "first_input_s": round(received_at - started, 3),
+        "import_timings": loader.get_timings(),
+    }
+
+    latencies, cpu, best = [], [], -np.inf
+    for iteration in range(args.trials):
+        value = objective(_normalized(params, config)) + args.noise * rng.standard_normal()
+        best = max(best, value)
+        bytes_before = dict(driver.bytes)
+        cpu_before = time.process_time()
+        sent_at = time.time()
+        driver.publish("result", {"parameters": params, "metrics": {config["objective_name"]: value}})
+        received_at, params = driver.inputs.get(timeout=args.timeout)
+
+        latency_ms = (received_at - sent_at) * 1000.0
+        cpu_ms = (time.process_time() - cpu_before) * 1000.0
+        latencies.append(latency_ms)
+        cpu.append(cpu_ms)
+        with host._optimizer_lock:
+            trial_count = len(host.optimizer.trial_table)
+            node = host.optimizer.trial_table[max(host.optimizer.trial_table)]["generation_node"]
+        record = {
+            "type": "iteration",
+            "iteration": iteration,
+            "trial_count": trial_count,
+            "generation_node": node,
+            "objective": round(value, 4),
+            "best": round(best, 4),
+            "result_to_input_ms": round(latency_ms, 2),
+            "suggest_ms": round(suggest_ms[-1], 2) if suggest_ms else None,
+            "cpu_ms": round(cpu_ms, 2),
+            "rss_mb": round(rss_mb(), 1),
+            "bytes": {k: v - bytes_before.get(k, 0) for k, v in driver.bytes.items() if v != bytes_before.get(k, 0)},
+            "payload_size": dict(driver.last_size),
+        }
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        if args.progress and (iteration + 1) % args.progress == 0:
+            print(f"[BENCH] {iteration + 1}/{args.trials} trials, "
+                  f"last result->input {latency_ms:.0f} ms", file=sys.stderr)
+
+    summary.update({
+        "total_s": round(time.time() - started, 3),
+        "result_to_input_ms": percentiles(latencies),
+        "suggest_ms": percentiles(suggest_ms),
+        "cpu_ms": percentiles(cpu),
+        "rss_mb": round(rss_mb(), 1),
+        "bytes_total": dict(driver.bytes),
+        "best": round(best, 4),
+    })
+    out.write(json.dumps(summary) + "\n")
+    out.flush()
+
+    host.mqtt_handler.stop()
+    driver.client.disconnect()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--objective", choices=sorted(OBJECTIVES), default="quadratic")
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("in_process", "process"), default="in_process")
+    parser.add_argument("--speculative", action="store_true")
+    parser.add_argument("--broker", help="host:port of a real broker; default is the in-process fake")
+    parser.add_argument("--checkpoint-dir", default=None)
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for each input")
+    parser.add_argument("--out", default="-", help="JSON-lines output file, - for stdout")
+    parser.add_argument("--progress", type=int, default=25, help="log to stderr every N trials, 0 to disable")
+    parser.add_argument("--verbose", action="store_true", help="keep the host's own logging")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    if not args.verbose:
+        # The host and Ax log every message; keep that out of the measurements and
+        # the output for the rest of the process (host threads outlive run())
+        logging.disable(logging.INFO)
+        sys.stdout = open(os.devnull, "w")
+    try:
+        run(args, out)
+    finally:
+        if out is not sys.__stdout__:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import queue
+import threading
+import time
+
+
+def topic_matches(subscription, topic):
+    # MQTT wildcard matching: + is one level, # is the rest
+    sub_levels = subscription.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(sub_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(sub_levels) == len(topic_levels)
+
+
+class FakeMessage:
+    def __init__(self, topic, payload, retain=False):
+        self.topic = topic
+        self.payload = payload
+        self.retain = retain
+
+
+class FakeBroker:
+    # In-process stand-in for mosquitto. Messages are delivered in publish order
+    # on one broker thread, like paho's network thread, and retained messages
+    # are replayed on subscribe.
+    def __init__(self):
+        self.clients = []
+        self.retained = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._deliver_loop, daemon=True, name="fake-broker").start()
+
+    def client(self):
+        return FakeClient(self)
+
+    def publish(self, topic, payload, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        with self._lock:
+            if retain:
+                self.retained[topic] = payload
+            targets = [c for c in self.clients if c.is_subscribed(topic)]
+        for client in targets:
+            self._queue.put((client, FakeMessage(topic, payload)))
+
+    def subscribe(self, client, subscription):
+        with self._lock:
+            retained = [(t, p) for t, p in self.retained.items() if topic_matches(subscription, t)]
+        for topic, payload in retained:
+            self._queue.put((client, FakeMessage(topic, payload, retain=True)))
+
+    def wait_idle(self, timeout=10.0):
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.005)
+
+    def _deliver_loop(self):
+        while True:
+            client, msg = self._queue.get()
+            try:
+                if client.on_message:
+                    client.on_message(client, None, msg)
+            except Exception as e:
+                print(f"[FAKE BROKER] Delivery to {msg.topic} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class FakeClient:
+    # The subset of paho.mqtt.client.Client that MQTTHandler and the benchmark use
+    def __init__(self, broker):
+        self.broker = broker
+        self.subscriptions = []
+        self.on_connect = None
+        self.on_message = None
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def connect(self, host=None, port=None, keepalive=60):
+        with self.broker._lock:
+            self.broker.clients.append(self)
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.append(topic)
+        self.broker.subscribe(self, topic)
+
+    def is_subscribed(self, topic):
+        return any(topic_matches(s, topic) for s in self.subscriptions)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload if payload is not None else b"", retain)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        with self.broker._lock:
+            if self in self.broker.clients:
+                self.broker.clients.remove(self)
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from bayes_platform.host import OptimizationHost
+from core import loader
+from utils.data_handler import load_default_config
+
+ADDRESS = "TEST/bay"
+OBJECTIVE = "granule_quality_index"
+
+
+@pytest.fixture(autouse=True, scope="session")
+def loader_finished():
+    yield
+    # Exiting while the background warm-up fit is inside torch aborts the process
+    if loader._thread is not None:
+        loader._thread.join()
+
+
+def make_host(checkpoint_dir, **settings):
+    host = OptimizationHost(ADDRESS, checkpoint_dir=str(checkpoint_dir), **settings)
+    host.published = []
+    host.mqtt_handler.publish = lambda key, data, retain=True: host.published.append((key, data))
+    return host
+
+
+def drain(host, timeout=120):
+    deadline = time.time() + timeout
+    while host._worker_scheduled or host._commands or host._deferred:
+        assert time.time() < deadline, "host did not go idle"
+        time.sleep(0.01)
+
+
+def hold(host):
+    # Keeps the worker busy until the returned event is set (or a failed test times out)
+    gate = threading.Event()
+    host.enqueue(gate.wait, 30)
+    return gate
+
+
+def send(host, suffix, payload):
+    host.handle_message(f"{ADDRESS}/{suffix}", payload)
+    drain(host)
+
+
+def start_run(host, config=None):
+    send(host, "setup", config or load_default_config())
+    send(host, "tagmap", {"screw_speed": "tag1"})
+    send(host, "python", True)
+
+
+def published(host, key):
+    return [data for k, data in host.published if k == key]
+
+
+def last_input(host):
+    return published(host, "input")[-1]
+
+
+def statuses(host):
+    return {idx: row["trial_status"] for idx, row in host.optimizer.trial_table.items()}
@@ -0,0 +1,159 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from core import fitting
+
+
+def generate_in_process(client, num_trials, training_trials=None, fit_options=None, predict_at=None):
+    # training_trials restricts the data the model is fitted on; the generation
+    # strategy still sees the whole experiment (node transitions, pending points).
+    # Returns the generator runs and the fit report (see core.fitting), which
+    # carries the model's objective predictions at predict_at when given.
+    experiment = client._experiment
+    data = experiment.lookup_data(trial_indices=training_trials) if training_trials is not None else None
+    with fitting.fit_context(fit_options) as fit_report:
+        grs_for_trials = client._generation_strategy_or_choose().gen(
+            experiment=experiment,
+            data=data,
+            n=1,
+            num_trials=num_trials,
+        )
+    if predict_at:
+        fit_report["predictions"] = predict_objective(client, predict_at)
+    return grs_for_trials, fit_report
+
+
+def predict_objective(client, parameterizations):
+    # (mean, sd) of a new observation of the objective at each parameterization,
+    # from the model the last generate used; None when that node has no model (Sobol)
+    from ax.core.observation import ObservationFeatures
+
+    name = client._experiment.optimization_config.objective.metric_names[0]
+    try:
+        means, covariances = client._generation_strategy.adapter.predict(
+            [ObservationFeatures(parameters=p) for p in parameterizations],
+            use_posterior_predictive=True,
+        )
+    except Exception:
+        return None
+    return [
+        (float(mean), math.sqrt(max(float(variance), 0.0)))
+        for mean, variance in zip(means[name], covariances[name][name])
+    ]
+
+
+class InProcessBackend:
+    # Fits and generates on the calling thread (the original behaviour)
+    def generate(self, client, num_trials, training_trials=None, fit_options=None, predict_at=None, version=None):
+        return generate_in_process(client, num_trials, training_trials, fit_options, predict_at)
+
+    def best_parameters(self, client, version=None):
+        return client.get_best_parameterization()
+
+    def close(self):
+        pass
+
+
+# --- Worker-side functions. Kept at module level so spawned workers can import
+# them without pulling in the host; Ax is only imported inside the worker.
+
+def _client_from_snapshot(snapshot):
+    from ax.api.client import Client
+    return Client._from_json_snapshot(snapshot)
+
+
+def _worker_generate(snapshot, num_trials, training_trials=None, fit_options=None, predict_at=None):
+    client = _client_from_snapshot(snapshot)
+    grs_for_trials, fit_report = generate_in_process(client, num_trials, training_trials, fit_options, predict_at)
+    # Only the candidates and fit report travel back, plus the node the strategy
+    # ended on so the host's copy advances (e.g. Sobol -> MBM) like an in-process run
+    return grs_for_trials, client._generation_strategy._curr.name, fit_report
+
+
+def _worker_best_parameters(snapshot):
+    client = _client_from_snapshot(snapshot)
+    return client.get_best_parameterization()
+
+
+class ProcessBackend:
+    """Runs fit + generate in a worker process so the host keeps the GIL.
+
+    The experiment and generation strategy are shipped as an Ax JSON snapshot,
+    reused between calls while the caller's version of the experiment is
+    unchanged; the worker is recycled after max_tasks calls to bound memory
+    growth and is killed and replaced when a call exceeds timeout seconds.
+    """
+
+    def __init__(self, timeout=120.0, max_tasks=50):
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self._pool = None
+        self._snapshot_cache = (None, None)  # (client id, version) -> snapshot
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: forking a process that already holds torch threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks,
+            )
+        return self._pool
+
+    def _call(self, func, *args):
+        future = self._get_pool().submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            print(f"[BACKEND] Worker exceeded {self.timeout}s; recycling it.")
+            self._kill_pool()
+            raise TimeoutError(f"Optimizer worker timed out after {self.timeout}s")
+
+    def _kill_pool(self):
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _snapshot(self, client, version):
+        # Serializing a long experiment holds the GIL; only redo it after a change
+        key = (id(client), version)
+        if version is None or self._snapshot_cache[0] != key:
+            self._snapshot_cache = (key, client._to_json_snapshot())
+        return self._snapshot_cache[1]
+
+    def generate(self, client, num_trials, training_trials=None, fit_options=None, predict_at=None, version=None):
+        generation_strategy = client._generation_strategy_or_choose()
+        grs_for_trials, node_name, fit_report = self._call(
+            _worker_generate, self._snapshot(client, version), num_trials, training_trials, fit_options, predict_at
+        )
+        # Recorded on the host's strategy as GenerationStrategy.gen does, so
+        # checkpoints keep them and the next snapshot carries generator state
+        # (e.g. the Sobol sequence position) forward
+        generation_strategy._curr = generation_strategy.nodes_by_name[node_name]
+        generation_strategy._generator_runs.extend(gr for trial_grs in grs_for_trials for gr in trial_grs)
+        self._snapshot_cache = (None, None)
+        return grs_for_trials, fit_report
+
+    def best_parameters(self, client, version=None):
+        return self._call(_worker_best_parameters, self._snapshot(client, version))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def make_backend(config):
+    kind = config.get("execution_backend", "in_process")
+    if kind == "in_process":
+        return InProcessBackend()
+    if kind == "process":
+        return ProcessBackend(
+            timeout=float(config.get("backend_timeout_s", 120)),
+            max_tasks=int(config.get("backend_max_tasks", 50)),
+        )
+    raise ValueError(f"Unsupported execution backend: {kind}")
@@ -0,0 +1,157 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+# full: Ax refits the GP hyperparameters from scratch on every generate (default)
+# warm_start: hyperparameter optimization starts from the previous fit
+# fixed: the previous hyperparameters are kept, the GP is only conditioned on the new data
+FIT_POLICIES = ("full", "warm_start", "fixed")
+
+_local = threading.local()
+_install_lock = threading.Lock()
+
+
+class FitPolicy:
+    # Chooses how each model fit gets its hyperparameters. Under warm_start and
+    # fixed a full refit still runs every refit_every fits, and immediately when
+    # the cheap fit's marginal log-likelihood per point drops more than
+    # refit_drift_tol below the one measured at the last full refit.
+    def __init__(self, config):
+        self.policy = config.get("fit_policy", "full")
+        if self.policy not in FIT_POLICIES:
+            raise ValueError(f"Unsupported fit policy: {self.policy}")
+        self.refit_every = max(1, int(config.get("refit_every", 10)))
+        self.drift_tolerance = float(config.get("refit_drift_tol", 0.5))
+        self.reference_mll = None
+        self.fits_since_refit = 0
+        self.full_refits = 0
+        self.cheap_fits = 0
+        self.drift_refits = 0
+        self.last_fit = None
+        self.last_mll = None
+
+    def options(self, model_state):
+        # Passed to the backend for the next generate; None lets Ax fit as usual
+        if self.policy == "full":
+            return None
+        if not model_state or self.reference_mll is None or self.fits_since_refit >= self.refit_every:
+            return {"state_dict": None}
+        return {
+            "state_dict": model_state,
+            "refit": self.policy == "warm_start",
+            "min_mll": self.reference_mll - self.drift_tolerance,
+        }
+
+    def record(self, report):
+        kind = report.get("kind")
+        if kind is None:
+            return  # Nothing was fitted (Sobol step, or data unchanged)
+        self.last_fit = kind
+        self.last_mll = report.get("mll")
+        if kind in ("full", "drift_refit"):
+            self.reference_mll = self.last_mll
+            self.fits_since_refit = 0
+            self.full_refits += 1
+            self.drift_refits += kind == "drift_refit"
+        else:
+            self.fits_since_refit += 1
+            self.cheap_fits += 1
+
+    def status(self):
+        return {
+            "policy": self.policy,
+            "refit_every": self.refit_every,
+            "refit_drift_tol": self.drift_tolerance,
+            "fits_since_refit": self.fits_since_refit,
+            "next_full_refit_in": max(0, self.refit_every - self.fits_since_refit) if self.policy != "full" else 0,
+            "full_refits": self.full_refits,
+            "cheap_fits": self.cheap_fits,
+            "drift_refits": self.drift_refits,
+            "last_fit": self.last_fit,
+            "last_mll_per_point": None if self.last_mll is None else round(self.last_mll, 4),
+        }
+
+
+@contextmanager
+def fit_context(options):
+    # Fit options for BoTorch fits on this thread; yields the report of what ran
+    install()
+    _local.options = options
+    _local.report = report = {}
+    try:
+        yield report
+    finally:
+        _local.options = None
+        _local.report = None
+
+
+def install():
+    # Wraps BoTorchGenerator.fit once per process. Outside fit_context (and for
+    # fits that pass their own state_dict, e.g. cross-validation) it is a no-op.
+    from ax.generators.torch.botorch_modular.generator import BoTorchGenerator
+
+    with _install_lock:
+        if getattr(BoTorchGenerator.fit, "_fit_policy", False):
+            return
+        original = BoTorchGenerator.fit
+
+        @wraps(original)
+        def fit(self, datasets, search_space_digest, candidate_metadata=None, state_dict=None, refit=True,
+                **kwargs):
+            report = getattr(_local, "report", None)
+            options = getattr(_local, "options", None)
+            if report is None or state_dict is not None:
+                return original(self, datasets, search_space_digest, candidate_metadata,
+                                state_dict=state_dict, refit=refit, **kwargs)
+
+            kind = "full"
+            if options is not None and options.get("state_dict"):
+                kind = "warm_start" if options["refit"] else "fixed"
+                try:
+                    original(self, datasets, search_space_digest, candidate_metadata,
+                             state_dict=_to_tensors(options["state_dict"]), refit=options["refit"], **kwargs)
+                    mll = _mll_per_point(self.surrogate.model)
+                    if mll < options["min_mll"]:
+                        print(f"[FIT] Drift check failed (mll {mll:.3f} < {options['min_mll']:.3f}); full refit.")
+                        kind = "drift_refit"
+                except RuntimeError as e:
+                    # e.g. the saved state no longer matches the model's shape
+                    print(f"[FIT] Could not reuse hyperparameters ({e}); full refit.")
+                    kind = "drift_refit"
+            if kind in ("full", "drift_refit"):
+                original(self, datasets, search_space_digest, candidate_metadata, **kwargs)
+                mll = _mll_per_point(self.surrogate.model) if options is not None else None
+
+            model = self.surrogate.model
+            report.update({
+                "kind": kind,
+                "mll": mll,
+                "model_state": {k: v.tolist() for k, v in model.state_dict().items()},
+            })
+
+        fit._fit_policy = True
+        BoTorchGenerator.fit = fit
+
+
+def _to_tensors(model_state):
+    import torch
+    return {k: torch.as_tensor(v, dtype=torch.double) for k, v in model_state.items()}
+
+
+def _mll_per_point(model):
+    # Average exact marginal log-likelihood of the training data (per outcome)
+    import torch
+    from gpytorch.mlls import ExactMarginalLogLikelihood
+
+    models = getattr(model, "models", None) or [model]
+    total = 0.0
+    for submodel in models:
+        submodel.train()
+        try:
+            with torch.no_grad():
+                mll = ExactMarginalLogLikelihood(submodel.likelihood, submodel)
+                output = submodel(*submodel.train_inputs)
+                total += float(mll(output, submodel.train_targets).sum())
+        finally:
+            submodel.eval()
+    return total / len(models)
@@ -0,0 +1,118 @@
+import importlib
+import threading
+import time
+
+from utils.metrics import METRICS
+
+
+# Heavy modules in the order they are loaded. pandas and torch come in through
+# Ax anyway; importing them first makes the per-stage timings meaningful.
+IMPORT_STAGES = ("numpy", "pandas", "torch", "ax.api.client", "core.optimizer")
+
+WARMUP_CONFIG = {
+    "parameters": [
+        {"name": "x1", "parameter_type": "range", "value_type": "float", "lb": 0.0, "ub": 1.0},
+        {"name": "x2", "parameter_type": "range", "value_type": "float", "lb": 0.0, "ub": 1.0},
+    ],
+    "objective_name": "warmup",
+}
+
+_ready = threading.Event()
+_lock = threading.Lock()
+_callbacks = []
+_thread = None
+timings = {}  # stage -> seconds
+error = None
+
+
+def start_background_load(warmup=True):
+    # Safe to call from every host; only the first call starts the loader
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_load, args=(warmup,), daemon=True, name="optimizer-loader")
+            _thread.start()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def when_ready(callback):
+    # Runs callback on the loader thread once the optimizer can be imported,
+    # or right away if it already can
+    with _lock:
+        if not _ready.is_set():
+            _callbacks.append(callback)
+            return
+    callback()
+
+
+def wait_ready(timeout=None):
+    start_background_load()
+    return _ready.wait(timeout)
+
+
+def get_timings():
+    # Copy for status payloads; the loader thread adds stages as it goes
+    with _lock:
+        return dict(timings)
+
+
+def _record(stage, started):
+    with _lock:
+        timings[stage] = round(time.time() - started, 3)
+    return timings[stage]
+
+
+def _load(warmup):
+    global error
+    started = time.time()
+    for module in IMPORT_STAGES:
+        t = time.time()
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            error = f"{module}: {e}"
+            print(f"[STARTUP] Failed to import {module}: {e}")
+        print(f"[STARTUP] Imported {module} in {_record(module, t):.2f}s")
+
+    # Fit a throwaway model so the first real MBM step does not pay for
+    # kernel compilation and lazy imports inside BoTorch. Done before the
+    # queued optimizer work is released, so it does not compete with it.
+    if warmup and error is None:
+        t = time.time()
+        try:
+            _warmup_fit()
+        except Exception as e:
+            print(f"[STARTUP] Warm-up fit failed: {e}")
+        print(f"[STARTUP] Warm-up fit in {_record('warmup_fit', t):.2f}s")
+    _record("total", started)
+
+    with _lock:
+        _ready.set()
+        callbacks = list(_callbacks)
+        _callbacks.clear()
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"[STARTUP] Ready callback failed: {e}")
+
+
+def _warmup_fit():
+    # Kept out of the process-wide stage histograms
+    with METRICS.muted():
+        _run_warmup()
+
+
+def _run_warmup():
+    from core.optimizer import BayesianOptimizer
+    optimizer = BayesianOptimizer(WARMUP_CONFIG)
+    # Walk the default strategy (center, Sobol) until the model step has run once
+    for _ in range(10):
+        idx, params = optimizer.suggest_next()
+        if optimizer.trial_table[idx]["generation_node"] == "MBM":
+            break
+        optimizer.complete_or_attach_trial(params, {"warmup": params["x1"] - (params["x2"] - 0.4) ** 2})
+    optimizer.close()
@@ -1,15 +1,107 @@
+import math
 from ax.api.client import Client
 from ax.api.configs import RangeParameterConfig, ChoiceParameterConfig
+from ax.core.arm import Arm
+from ax.core.data import Data
+from core.backends import make_backend
+from core.fitting import FitPolicy
+from utils.data_handler import read_history
+from utils.metrics import METRICS
 import json 
+import numpy as np
 import pandas as pd
 
+# How much history the surrogate is fitted on once there are more than
+# model_max_trials completed trials; every trial is still kept in the experiment
+SCALING_MODES = ("full", "window", "trust_region")
+
+
 class BayesianOptimizer:
-    def __init__(self, config, status_callback=None):
+    def __init__(self, config, status_callback=None, client=None):
         self.status_callback = status_callback
-        self.client = Client()
         self.config = config
-        self.trial_indices = {}
-        self._configure_experiment()
+        # Canonical rounded-parameter key -> trial index, for O(1) result matching.
+        # Rounding is per parameter ("decimals" in the setup config, default 2).
+        self.trial_index_by_key = {}
+        self._param_names = [p["name"] for p in config["parameters"]]
+        self._param_decimals = {
+            p["name"]: int(p.get("decimals", 2))
+            for p in config["parameters"] if p["parameter_type"] == "range"
+        }
+        self._int_params = {p["name"] for p in config["parameters"] if p.get("value_type") == "int"}
+        # Trial table maintained in place on every suggestion/completion so the
+        # host never has to rebuild the Ax Summary analysis to publish state.
+        self.trial_table = {}
+        self.table_version = 0
+        self._row_versions = {}  # trial_index -> version, ordered by last update
+        self._summary_cache = (None, None)
+        # Bumped whenever observed data changes; keys the best-parameterization cache
+        self.data_version = 0
+        self._best_cache = (None, None, None)
+        # Where fit/generate runs: in this process or in a recycled worker process
+        self.backend = make_backend(config)
+        # Hyperparameters of the last fitted surrogate, persisted with checkpoints
+        # and reused as the starting point under the warm_start/fixed fit policies
+        self.model_state = None
+        self._check_scaling(config)
+        self.fit_policy = FitPolicy(config)
+        # Trials used / available and fit policy of the last model fit, for platform_status
+        self.model_info = {
+            "scaling": config.get("model_scaling", "full"),
+            "trained_on": None,
+            "completed": None,
+            "fit": self.fit_policy.status(),
+        }
+
+        if client is None:
+            self.client = Client()
+            self._configure_experiment()
+        else:
+            self.client = client
+            self._rebuild_tables()
+
+    def to_snapshot(self):
+        return {
+            "config": self.config,
+            "ax": self.client._to_json_snapshot(),
+            "model_state": self.model_state,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot, status_callback=None):
+        # Restores experiment + generation strategy without fitting anything;
+        # the model is only fitted when the next suggestion is requested.
+        client = Client._from_json_snapshot(snapshot["ax"])
+        optimizer = cls(snapshot["config"], status_callback=status_callback, client=client)
+        optimizer.model_state = snapshot.get("model_state")
+        return optimizer
+
+    def update_config(self, config):
+        # Same experiment definition, new run settings (e.g. execution backend)
+        self._check_scaling(config)
+        fit_policy = FitPolicy(config)
+        self.config = config
+        self.backend.close()
+        self.backend = make_backend(config)
+        self.fit_policy = fit_policy
+        self.model_info["scaling"] = config.get("model_scaling", "full")
+        self.model_info["fit"] = fit_policy.status()
+
+    @staticmethod
+    def _check_scaling(config):
+        if config.get("model_scaling", "full") not in SCALING_MODES:
+            raise ValueError(f"Unsupported model scaling: {config['model_scaling']}")
+
+    def _rebuild_tables(self):
+        experiment = self.client._experiment
+        metrics_by_trial = {}
+        data = experiment.lookup_data().df
+        for row in data[["trial_index", "metric_name", "mean"]].itertuples(index=False):
+            metrics_by_trial.setdefault(row.trial_index, {})[row.metric_name] = row.mean
+        for idx, trial in sorted(experiment.trials.items()):
+            if trial.status.name != "ABANDONED":
+                self._index_trial(idx, trial.arm.parameters)
+            self._record_trial(idx, metrics_by_trial.get(idx))
 
     def _configure_experiment(self):
         param_configs = []
@@ -43,32 +135,153 @@ class BayesianOptimizer:
         )
 
     def suggest_next(self):
-        trials = self.client.get_next_trials(max_trials=1)
+        trials = self.suggest_batch(1)
         trial_index = list(trials.keys())[0]
         parameters = trials[trial_index]
-        self.trial_indices[trial_index] = parameters
         return trial_index, parameters
 
-    def complete_or_attach_trial(self, parameters, data):
-        # Standardize parameters: convert to float and round to 2 decimals
-        def normalize_param_dict(d):
-            result = {}
-            for k, v in d.items():
-                try:
-                    result[k] = round(float(v), 2)
-                except Exception as e:
-                    raise ValueError(f"Invalid parameter value for '{k}': {v} ({e})")
-            return result
-
-        # Normalize both input parameters and existing ones for comparison
-        norm_input_params = normalize_param_dict(parameters)
-
-        matched_index = None
-        for idx, trial_params in self.trial_indices.items():
-            norm_trial_params = normalize_param_dict(trial_params)
-            if norm_input_params == norm_trial_params:
-                matched_index = idx
-                break
+    def suggest_batch(self, batch_size):
+        # One model fit for the whole batch; Ax marks each candidate as pending
+        # before generating the next, so the batch is spread out jointly.
+        return self.attach_generated(self.generate(num_trials=batch_size))
+
+    def generate(self, num_trials=1):
+        # Generator runs are produced without touching the experiment, so a
+        # speculative candidate can be dropped at no cost. RUNNING trials are
+        # passed to the model as pending points.
+        return self._generate(num_trials)[0]
+
+    def speculate(self, num_trials, trial_indices):
+        # Like generate(), plus the model's (mean, sd) prediction of the objective
+        # at each of trial_indices, or None when no model was used
+        parameters = [self.trial_table[idx]["parameters"] for idx in trial_indices]
+        grs_for_trials, predictions = self._generate(num_trials, parameters)
+        if predictions is not None:
+            predictions = dict(zip(trial_indices, predictions))
+        return grs_for_trials, predictions
+
+    def _generate(self, num_trials, predict_at=None):
+        training = self.training_trials()
+        fit_options = self.fit_policy.options(self.model_state)
+        with METRICS.timer("generate"):
+            grs_for_trials, fit_report = self.backend.generate(
+                self.client, num_trials, training, fit_options, predict_at, version=self.table_version
+            )
+        # Ax times the fit and the acquisition optimization on each generator run
+        for trial_grs in grs_for_trials:
+            for gr in trial_grs:
+                if gr.fit_time is not None:
+                    METRICS.observe("model_fit", gr.fit_time * 1000.0)
+                if gr.gen_time is not None:
+                    METRICS.observe("candidate_gen", gr.gen_time * 1000.0)
+        self.fit_policy.record(fit_report)
+        self.model_info["fit"] = self.fit_policy.status()
+        if fit_report.get("model_state"):
+            self.model_state = fit_report["model_state"]
+        return grs_for_trials, fit_report.get("predictions")
+
+    def training_trials(self):
+        # Trial indices the surrogate is fitted on, or None for all data. Past
+        # model_max_trials completed trials, "window" keeps the most recent ones
+        # plus the model_keep_best best, "trust_region" the ones nearest the
+        # incumbent (candidates are still searched over the whole space).
+        mode = self.config.get("model_scaling", "full")
+        objective = self.client._experiment.optimization_config.objective
+        name = objective.metric_names[0]
+        completed = [
+            idx for idx, row in self.trial_table.items()
+            if row["trial_status"] == "COMPLETED" and np.isfinite(row["metrics"].get(name, np.nan))
+        ]
+        max_trials = int(self.config.get("model_max_trials", 150))
+        self.model_info["completed"] = len(completed)
+        self.model_info["trained_on"] = len(completed)
+        if mode == "full" or len(completed) <= max_trials:
+            return None
+
+        completed = np.array(sorted(completed))
+        values = np.array([self.trial_table[idx]["metrics"][name] for idx in completed], dtype=float)
+        if objective.minimize:
+            values = -values
+        if mode == "window":
+            # At most half the window, so the most recent trials always get in
+            keep_best = min(int(self.config.get("model_keep_best", 10)), max_trials // 2)
+            keep = set(completed[np.argsort(-values, kind="stable")[:keep_best]].tolist())
+            for idx in completed[::-1].tolist():
+                if len(keep) >= max_trials:
+                    break
+                keep.add(idx)
+        else:
+            distances = self._normalized_distances(completed, completed[np.argmax(values)])
+            keep = set(completed[np.argsort(distances, kind="stable")[:max_trials]].tolist())
+        self.model_info["trained_on"] = len(keep)
+        return sorted(keep)
+
+    def _normalized_distances(self, indices, center_index):
+        # Euclidean distance in the unit cube; a differing choice value counts as 1
+        center = self.trial_table[center_index]["parameters"]
+        squared = np.zeros(len(indices))
+        for p in self.config["parameters"]:
+            values = [self.trial_table[idx]["parameters"][p["name"]] for idx in indices]
+            if p["parameter_type"] == "range":
+                scaled = (np.array(values, dtype=float) - center[p["name"]]) / (p["ub"] - p["lb"])
+                squared += scaled ** 2
+            else:
+                squared += np.array([v != center[p["name"]] for v in values], dtype=float)
+        return np.sqrt(squared)
+
+    def attach_generated(self, grs_for_trials):
+        trials = {}
+        for trial_grs in grs_for_trials:
+            trial = self.client._experiment.new_trial(generator_run=trial_grs[0])
+            trial.mark_running(no_runner_required=True)
+            self._index_trial(trial.index, trial.arm.parameters)
+            self._record_trial(trial.index)
+            trials[trial.index] = trial.arm.parameters
+        return trials
+
+    def round_parameters(self, parameters):
+        rounded = {}
+        for k, v in parameters.items():
+            if k not in self._param_decimals:
+                rounded[k] = v
+                continue
+            try:
+                v = round(float(v), self._param_decimals[k])
+            except Exception as e:
+                raise ValueError(f"Invalid parameter value for '{k}': {v} ({e})")
+            rounded[k] = int(v) if k in self._int_params else v
+        return rounded
+
+    def change_tolerances(self):
+        # Smallest difference treated as an edit when comparing HMI data_in rows;
+        # None compares by value (choice parameters)
+        tolerances = {
+            name: 10.0 ** -self._param_decimals[name] if name in self._param_decimals else None
+            for name in self._param_names
+        }
+        metric_tolerances = self.config.get("metric_tolerances", {})
+        for m in self.client._experiment.metrics:
+            tolerances[m] = float(metric_tolerances.get(m, 0.01))
+        return tolerances
+
+    def param_key(self, parameters):
+        rounded = self.round_parameters(parameters)
+        return tuple(rounded.get(name) for name in self._param_names)
+
+    def _index_trial(self, trial_index, parameters):
+        # First trial wins for duplicate parameterizations, as with the old linear scan
+        self.trial_index_by_key.setdefault(self.param_key(parameters), trial_index)
+
+    @METRICS.timed("match")
+    def find_trial(self, parameters):
+        return self.trial_index_by_key.get(self.param_key(parameters))
+
+    @METRICS.timed("complete_trial")
+    def complete_or_attach_trial(self, parameters, data, trial_index=None):
+        # trial_index completes that trial; otherwise the first trial with the same
+        # rounded parameters, or a new one
+        norm_input_params = self.round_parameters(parameters)
+        matched_index = trial_index if trial_index is not None else self.find_trial(norm_input_params)
 
         # Format metrics to float or (float, float)
         cleaned_data = {}
@@ -81,20 +294,238 @@ class BayesianOptimizer:
             except Exception as e:
                 raise ValueError(f"Invalid metric format for '{k}': {v} ({e})")
 
+        self.data_version += 1
         if matched_index is not None:
             self.client.complete_trial(trial_index=matched_index, raw_data=cleaned_data)
+            self._record_trial(matched_index, cleaned_data)
             return matched_index
         else:
             idx = self.client.attach_trial(parameters=norm_input_params)
+            self._index_trial(idx, norm_input_params)
             self.client.complete_trial(trial_index=idx, raw_data=cleaned_data)
+            self._record_trial(idx, cleaned_data)
             return idx
 
+    def validate_history(self, source):
+        # Vectorized check of historical rows against the search space. Returns
+        # the accepted rows (rounded like live inputs) and the number rejected.
+        df = read_history(source).reset_index(drop=True)
+        metric_names = [m for m in self.client._experiment.metrics if m in df.columns]
+        if self.config["objective_name"] not in metric_names:
+            raise ValueError(f"History has no '{self.config['objective_name']}' column")
+
+        clean = pd.DataFrame(index=df.index)
+        valid = np.ones(len(df), dtype=bool)
+        for p in self.config["parameters"]:
+            name = p["name"]
+            if name not in df.columns:
+                raise ValueError(f"History is missing parameter '{name}'")
+            if p["parameter_type"] == "range":
+                values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+                ok = np.isfinite(values)
+                ok[ok] = (values[ok] >= p["lb"]) & (values[ok] <= p["ub"])
+                values = np.round(values, self._param_decimals[name])
+                if name in self._int_params:
+                    ok &= values == np.round(values)
+                valid &= ok
+                clean[name] = values
+            else:
+                valid &= df[name].isin(p["values"]).to_numpy()
+                clean[name] = df[name]
+        for m in metric_names:
+            clean[m] = pd.to_numeric(df[m], errors="coerce").to_numpy(dtype=float)
+        valid &= np.isfinite(clean[self.config["objective_name"]].to_numpy())
+
+        clean = clean[valid]
+        for name in self._int_params:
+            clean[name] = clean[name].astype(int)
+        return clean, int((~valid).sum())
+
+    @METRICS.timed("attach_history")
+    def attach_history(self, history):
+        # Attaches every row as a completed trial with a single data update, so
+        # the model is fitted once on the next generate instead of per trial.
+        if history.empty:
+            return []
+        experiment = self.client._experiment
+        metric_names = [m for m in history.columns if m in experiment.metrics]
+        param_records = history[self._param_names].to_dict("records")
+
+        trials = []
+        for parameters in param_records:
+            trial = experiment.new_trial()
+            trial.add_arm(Arm(parameters=parameters))
+            trial.mark_running(no_runner_required=True)
+            trials.append(trial)
+
+        long = pd.DataFrame({
+            "trial_index": np.repeat([t.index for t in trials], len(metric_names)),
+            "arm_name": np.repeat([t.arm.name for t in trials], len(metric_names)),
+            "metric_name": np.tile(metric_names, len(trials)),
+            "mean": history[metric_names].to_numpy(dtype=float).ravel(),
+        })
+        long = long[np.isfinite(long["mean"])]
+        long["sem"] = np.nan
+        long["metric_signature"] = [experiment.metrics[m].signature for m in long["metric_name"]]
+        experiment.attach_data(Data(df=long))
+
+        metric_records = history[metric_names].to_dict("records")
+        for trial, parameters, metrics in zip(trials, param_records, metric_records):
+            trial.mark_completed()
+            self._index_trial(trial.index, parameters)
+            self._record_trial(trial.index, {k: v for k, v in metrics.items() if v == v})
+        self.data_version += 1
+        return [t.index for t in trials]
+
+    def load_history(self, source):
+        history, rejected = self.validate_history(source)
+        return self.attach_history(history), rejected
+
+    def attach_running_trial(self, parameters):
+        parameters = self.round_parameters(parameters)
+        idx = self.client.attach_trial(parameters=parameters)
+        self._index_trial(idx, parameters)
+        self._record_trial(idx)
+        return idx
+
+    def abandon_trial(self, trial_index):
+        self.client.mark_trial_abandoned(trial_index)
+        # A late result for an abandoned point is attached as a new trial
+        key = self.param_key(self.trial_table[trial_index]["parameters"])
+        if self.trial_index_by_key.get(key) == trial_index:
+            del self.trial_index_by_key[key]
+        self._record_trial(trial_index)
+
+    def objective_value(self, metrics):
+        # Observed objective mean from a result's metrics, or None if missing
+        value = metrics.get(self.config["objective_name"])
+        if isinstance(value, (list, tuple)):
+            value = value[0]
+        if value is None or not np.isfinite(value):
+            return None
+        return float(value)
+
+    def best_observed(self):
+        # Best objective value over the completed trials, or None before any
+        name = self.config["objective_name"]
+        values = [
+            row["metrics"].get(name, np.nan) for row in self.trial_table.values()
+            if row["trial_status"] == "COMPLETED"
+        ]
+        values = [v for v in values if np.isfinite(v)]
+        if not values:
+            return None
+        return min(values) if self.minimize else max(values)
+
+    @property
+    def minimize(self):
+        return self.client._experiment.optimization_config.objective.minimize
+
     def get_best_parameters(self):
-        
-        return self.client.get_best_parameterization()
+        # Only recomputed (possibly fitting a model) after new data arrives;
+        # failures are cached too so they are not retried every status tick.
+        version, best, error = self._best_cache
+        if version != self.data_version:
+            best, error = None, None
+            try:
+                best = self.backend.best_parameters(self.client, version=self.table_version)
+            except Exception as e:
+                error = e
+            self._best_cache = (self.data_version, best, error)
+        if error is not None:
+            raise error
+        return best
+
+    def close(self):
+        self.backend.close()
     
     
+    def _record_trial(self, trial_index, metrics=None):
+        trial = self.client._experiment.trials[trial_index]
+        row = self.trial_table.get(trial_index)
+        if row is None:
+            generator_runs = trial.generator_runs
+            row = {
+                "trial_index": trial_index,
+                "arm_name": trial.arm.name,
+                "trial_status": None,
+                "status_reason": None,
+                "generation_node": generator_runs[0]._generation_node_name if generator_runs else None,
+                "parameters": dict(trial.arm.parameters),
+                "metrics": {},
+            }
+            self.trial_table[trial_index] = row
+        row["trial_status"] = trial.status.name
+        row["status_reason"] = getattr(trial, "status_reason", None)
+        if metrics:
+            for k, v in metrics.items():
+                # Summary reports the mean for (mean, sem) outcomes
+                row["metrics"][k] = v[0] if isinstance(v, tuple) else v
+
+        self.table_version += 1
+        self._row_versions.pop(trial_index, None)
+        self._row_versions[trial_index] = self.table_version
+
+    def changed_trials(self, since_version=0):
+        # _row_versions is ordered by version, so walk back from the newest entry
+        changed = []
+        for idx in reversed(self._row_versions):
+            if self._row_versions[idx] <= since_version:
+                break
+            changed.append(idx)
+        return sorted(changed)
+
+    def trial_records(self, indices=None):
+        # Published form of the trial table. Parameters and metrics are rounded
+        # finely enough that an unchanged row echoed back on data_in stays within
+        # change_tolerances().
+        def _round(v, decimals):
+            return round(v, decimals) if isinstance(v, float) and decimals is not None else v
+
+        if indices is None:
+            indices = sorted(self.trial_table)
+        metric_names = list(self.client._experiment.metrics.keys())
+        tolerances = self.change_tolerances()
+        # Rounding error is at most half a step, which must stay below the tolerance
+        metric_decimals = {
+            m: max(2, math.ceil(-math.log10(2 * tolerances[m]))) if tolerances[m] > 0 else None
+            for m in metric_names
+        }
+        records = []
+        for idx in indices:
+            row = self.trial_table[idx]
+            record = {k: v for k, v in row.items() if k not in ("parameters", "metrics")}
+            record["parameters"] = self.round_parameters(row["parameters"])
+            record["metrics"] = {
+                m: _round(row["metrics"].get(m, float("nan")), metric_decimals[m]) for m in metric_names
+            }
+            records.append(record)
+        return records
+
+    @METRICS.timed("summarize")
+    def summarize(self) -> pd.DataFrame:
+        # Same columns as the Ax Summary card, served from the trial table
+        version, df = self._summary_cache
+        if version == self.table_version:
+            return df
+
+        metric_names = list(self.client._experiment.metrics.keys())
+        rows = []
+        for idx in sorted(self.trial_table):
+            row = self.trial_table[idx]
+            flat = {k: v for k, v in row.items() if k not in ("parameters", "metrics")}
+            for m in metric_names:
+                flat[m] = row["metrics"].get(m, float("nan"))
+            flat.update(row["parameters"])
+            rows.append(flat)
+        df = pd.DataFrame.from_records(rows)
+        self._summary_cache = (self.table_version, df)
+        return df
+
+    @METRICS.timed("custom_summarize")
     def custom_summarize(self) -> pd.DataFrame:
+        # Full Ax Summary rebuild; only used when explicitly requested
+
         from ax.analysis.summary import Summary
         (card,) = Summary(omit_empty_columns=False).compute(
             experiment=self.client._experiment,
@@ -1,4 +1,20 @@
+import sys
 from bayes_platform.host import OptimizationHost
+from bayes_platform.multi_host import MultiBayHost
+from mqtt.mqtt_handler import MQTTHandler
+from utils.metrics import start_http_server
 
 if __name__ == "__main__":
-    OptimizationHost().start()
+    # python main.py --metrics-port 9108  also serves stage latencies in Prometheus format
+    if "--metrics-port" in sys.argv:
+        start_http_server(int(sys.argv[sys.argv.index("--metrics-port") + 1]))
+
+    # python main.py --log-level debug  logs whole MQTT payloads (info truncates, warning omits them)
+    if "--log-level" in sys.argv:
+        MQTTHandler.log_level = sys.argv[sys.argv.index("--log-level") + 1]
+
+    # python main.py --multi  serves every bay under LC/+/+/+/bay from one process
+    if "--multi" in sys.argv:
+        MultiBayHost().start()
+    else:
+        OptimizationHost().start()
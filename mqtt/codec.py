@@ -0,0 +1,104 @@
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Plain JSON is sent as-is, so existing subscribers keep working. Every other
+# encoding is framed as MARKER + content type + "\n" + body, e.g.
+# b"\x1ecolumnar+zlib\n<deflated JSON>". JSON text can never start with 0x1E.
+MARKER = b"\x1e"
+FORMATS = ("json", "msgpack", "columnar")
+
+
+def parse_encoding(encoding):
+    # "columnar+zlib" -> ("columnar", True)
+    fmt, _, compression = encoding.partition("+")
+    if fmt not in FORMATS or compression not in ("", "zlib"):
+        raise ValueError(f"Unsupported payload encoding: {encoding}")
+    if fmt == "msgpack" and msgpack is None:
+        raise ValueError("msgpack encoding requested but the msgpack package is not installed")
+    return fmt, compression == "zlib"
+
+
+def encode(data, encoding="json"):
+    fmt, compressed = parse_encoding(encoding)
+    if fmt == "msgpack":
+        body = msgpack.packb(data, use_bin_type=True)
+    else:
+        if fmt == "columnar":
+            data = to_columnar(data)
+        body = json.dumps(data).encode()
+    if compressed:
+        body = zlib.compress(body)
+    elif fmt == "json":
+        return body.decode()
+    return MARKER + encoding.encode() + b"\n" + body
+
+
+def content_type(payload):
+    if isinstance(payload, (bytes, bytearray)) and payload[:1] == MARKER:
+        header_end = payload.find(b"\n")
+        return bytes(payload[1:header_end]).decode(errors="replace") if header_end > 0 else "unknown"
+    return "json"
+
+
+def decode(payload):
+    # Accepts every encoding encode() produces; raises ValueError on bad input
+    if isinstance(payload, str):
+        payload = payload.encode()
+    if payload[:1] != MARKER:
+        return json.loads(payload)
+    header_end = payload.find(b"\n")
+    if header_end < 0:
+        raise ValueError("Encoded payload has no content-type header")
+    fmt, compressed = parse_encoding(bytes(payload[1:header_end]).decode())
+    body = bytes(payload[header_end + 1:])
+    if compressed:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise ValueError(f"corrupt zlib body ({e})")
+    if fmt == "msgpack":
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(f"corrupt msgpack body ({e})")
+    data = json.loads(body)
+    return from_columnar(data) if fmt == "columnar" else data
+
+
+def to_columnar(data):
+    # {"trials": [record, ...]} -> {"trials": {"length": n, "columns": {key: [...], ...}}}:
+    # every key is listed once and its values are one array in trial order.
+    # One level of nesting (parameters, metrics) becomes a dict of arrays.
+    if not isinstance(data, dict) or not isinstance(data.get("trials"), list):
+        return data
+    records = data["trials"]
+    keys = list(dict.fromkeys(k for record in records for k in record))
+    table = {}
+    for key in keys:
+        values = [record.get(key) for record in records]
+        if any(isinstance(v, dict) for v in values):
+            names = list(dict.fromkeys(name for v in values if v for name in v))
+            table[key] = {name: [(v or {}).get(name) for v in values] for name in names}
+        else:
+            table[key] = values
+    return dict(data, trials={"length": len(records), "columns": table})
+
+
+def from_columnar(data):
+    if not isinstance(data, dict) or not isinstance(data.get("trials"), dict):
+        return data
+    length, table = data["trials"]["length"], data["trials"]["columns"]
+    records = [{} for _ in range(length)]
+    for key, column in table.items():
+        if isinstance(column, dict):
+            for i, record in enumerate(records):
+                record[key] = {name: values[i] for name, values in column.items()}
+        else:
+            for record, value in zip(records, column):
+                record[key] = value
+    return dict(data, trials=records)
@@ -1,15 +1,39 @@
 import paho.mqtt.client as mqtt
-import json
 import threading
+import time
+from collections import deque
+from mqtt import codec
+from utils.metrics import METRICS
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+# Topics whose oldest queued message is dropped when the outbound queue is full;
+# the next one supersedes it anyway. Everything else waits for room.
+STATUS_SUFFIXES = ("status", "platform_status", "metrics")
+# Retained topics that carry state: a queued message is replaced by the next one.
+# status is retained too, but each message there is a separate event.
+COALESCED_SUFFIXES = ("platform_status", "data_snapshot", "input")
+
+
+def truncate(text, limit=200):
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
 
 
 class MQTTHandler:
-    def __init__(self, broker, port, username, password, topics):
+    # info logs payloads cut to log_max_chars, debug logs them whole
+    log_level = "info"
+    log_max_chars = 200
+
+    def __init__(self, broker, port, username, password, topics, max_queue=1000, backpressure_timeout=5.0):
         self.broker = broker
         self.port = port
         self.username = username
         self.password = password
         self.topics = topics  # dict: {'trigger': '...', 'input': '...', etc.}
+        self.encodings = {}  # topic key -> mqtt.codec encoding; JSON when absent
         self.client = mqtt.Client()
         self.client.username_pw_set(self.username, self.password)
 
@@ -17,6 +41,18 @@ class MQTTHandler:
         self.status_callback = None
         self._lock = threading.Lock()
 
+        # Publishes are encoded by the caller and sent by one publisher thread.
+        # A retained state message still queued for a topic is superseded by the next.
+        self.max_queue = max_queue
+        self.backpressure_timeout = backpressure_timeout
+        self._outbound = deque()  # [topic, payload, retain, enqueued_at, queued]
+        self._latest_retained = {}
+        self._outbound_depth = 0  # Queued plus in flight
+        self._outbound_cond = threading.Condition()
+        self._publisher = None
+        self._stopping = False
+        self.outbound_stats = {"published": 0, "coalesced": 0, "dropped": 0, "failed": 0, "max_depth": 0}
+
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
 
@@ -26,6 +62,18 @@ class MQTTHandler:
     def set_status_callback(self, callback):
         self.status_callback = callback
 
+    def set_encodings(self, encodings):
+        self.encodings = validate_encodings(encodings, self.topics)
+
+    def log(self, level, message):
+        if LOG_LEVELS[level] >= LOG_LEVELS[self.log_level]:
+            print(message)
+
+    def preview(self, payload):
+        if isinstance(payload, (bytes, bytearray)):
+            return f"<{codec.content_type(payload)}, {len(payload)} bytes>"
+        return payload if self.log_level == "debug" else truncate(payload, self.log_max_chars)
+
     def _on_connect(self, client, userdata, flags, rc):
         print(f"[MQTT] Connected with result code {rc}")
         for topic in self.topics.values():
@@ -33,22 +81,29 @@ class MQTTHandler:
             print(f"[MQTT] Subscribed to: {topic}")
 
     def _on_message(self, client, userdata, msg):
-        raw_payload = msg.payload.decode()
-        print(f"[MQTT] Message received on {msg.topic}: '{raw_payload}'")
+        encoding = codec.content_type(msg.payload)
+        if encoding == "json":
+            raw_payload = msg.payload.decode()
+            self.log("info", f"[MQTT] Message received on {msg.topic}: '{self.preview(raw_payload)}'")
 
-        if not raw_payload.strip():
-            self.publish_status("status", {
-                "status": "error",
-                "message": "Empty payload received; cannot decode"
-            })
-            return
+            if not raw_payload.strip():
+                self.publish_status("status", {
+                    "status": "error",
+                    "message": "Empty payload received; cannot decode"
+                })
+                return
+        else:
+            raw_payload = self.preview(msg.payload)
+            self.log("info", f"[MQTT] Message received on {msg.topic}: {raw_payload}")
 
+        METRICS.incr("messages_received")
         try:
-            data = json.loads(raw_payload)
-        except json.JSONDecodeError as e:
+            with METRICS.timer("mqtt_decode"):
+                data = codec.decode(msg.payload)
+        except ValueError as e:
             self.publish_status("status", {
                 "status": "error",
-                "message": f"JSON decode error: {str(e)}. Raw: '{raw_payload}'"
+                "message": f"{encoding.upper()} decode error: {str(e)}. Raw: '{truncate(raw_payload)}'"
             })
             return
 
@@ -64,19 +119,166 @@ class MQTTHandler:
         except Exception as e:
             print(f"[MQTT ERROR] Could not connect: {e}")
 
-    def publish(self, topic_key, data):
+    def channel(self, topics):
+        return TopicChannel(self, topics)
+
+    def publish(self, topic_key, data, retain=True):
         if topic_key not in self.topics:
             print(f"[MQTT WARNING] Unknown topic key: {topic_key}")
             return
-        topic = self.topics[topic_key]
+        self.publish_to(self.topics[topic_key], data, retain=retain,
+                        encoding=self.encodings.get(topic_key, "json"))
+
+    def publish_status(self, topic_key, data):
+        # Decode errors from _on_message; not retained so they do not outlive the fault
+        self.publish(topic_key, data, retain=False)
+
+    def publish_to(self, topic, data, retain=True, encoding="json"):
+        # Encoded here so the message reflects the state at call time
         try:
-            payload = json.dumps(data) if not isinstance(data, str) else data
-            self.client.publish(topic, payload, retain=True)
-            print(f"[MQTT] Published to {topic}: {payload}")
+            with METRICS.timer("serialize"):
+                payload = codec.encode(data, encoding) if not isinstance(data, str) else data
         except Exception as e:
-            print(f"[MQTT ERROR] Failed to publish to {topic}: {e}")
+            self.log("error", f"[MQTT ERROR] Failed to encode for {topic}: {e}")
+            return
+        self._enqueue([topic, payload, retain, time.time(), True])
+
+    def _enqueue(self, entry):
+        topic, retain = entry[0], entry[2]
+        suffix = topic.rpartition("/")[2]
+        droppable = suffix in STATUS_SUFFIXES
+        with self._outbound_cond:
+            self._ensure_publisher()
+            if retain and suffix in COALESCED_SUFFIXES:
+                previous = self._latest_retained.get(topic)
+                if previous is not None and previous[4]:
+                    previous[4] = False
+                    self._outbound_depth -= 1
+                    self.outbound_stats["coalesced"] += 1
+                    METRICS.incr("publish_coalesced")
+                self._latest_retained[topic] = entry
+
+            if self._outbound_depth >= self.max_queue and not self._drop_oldest_status():
+                if droppable:
+                    entry[4] = False
+                    self._count_drop(topic)
+                    return
+                # Backpressure: the producer (optimizer worker) waits for room
+                if not self._outbound_cond.wait_for(
+                    lambda: self._outbound_depth < self.max_queue, timeout=self.backpressure_timeout
+                ):
+                    self.log("warning", f"[MQTT WARNING] Outbound queue still full after "
+                                        f"{self.backpressure_timeout}s; queueing {topic} anyway")
+
+            self._outbound.append(entry)
+            self._outbound_depth += 1
+            if self._outbound_depth > self.outbound_stats["max_depth"]:
+                self.outbound_stats["max_depth"] = self._outbound_depth
+            self._outbound_cond.notify_all()
+
+    def _drop_oldest_status(self):
+        for queued in self._outbound:
+            if queued[4] and queued[0].rpartition("/")[2] in STATUS_SUFFIXES:
+                queued[4] = False
+                self._outbound_depth -= 1
+                self._count_drop(queued[0])
+                return True
+        return False
+
+    def _count_drop(self, topic):
+        self.outbound_stats["dropped"] += 1
+        METRICS.incr("publish_dropped")
+        self.log("debug", f"[MQTT] Outbound queue full; dropped a message for {topic}")
+
+    def _ensure_publisher(self):
+        if self._publisher is None or not self._publisher.is_alive():
+            self._stopping = False
+            self._publisher = threading.Thread(target=self._publish_loop, daemon=True, name="mqtt-publisher")
+            self._publisher.start()
+
+    def _publish_loop(self):
+        while True:
+            with self._outbound_cond:
+                while not self._outbound and not self._stopping:
+                    self._outbound_cond.wait()
+                if not self._outbound:
+                    return
+                entry = self._outbound.popleft()
+                if not entry[4]:
+                    continue  # Superseded or dropped while queued
+                entry[4] = False
+                if self._latest_retained.get(entry[0]) is entry:
+                    del self._latest_retained[entry[0]]
+
+            topic, payload, retain, enqueued_at, _ = entry
+            METRICS.observe("publish_queue", (time.time() - enqueued_at) * 1000.0)
+            try:
+                with METRICS.timer("publish"):
+                    self.client.publish(topic, payload, retain=retain)
+                self.outbound_stats["published"] += 1
+                METRICS.incr("messages_published")
+                METRICS.incr("bytes_published", len(payload))
+                self.log("info", f"[MQTT] Published to {topic}: {self.preview(payload)}")
+            except Exception as e:
+                self.outbound_stats["failed"] += 1
+                self.log("error", f"[MQTT ERROR] Failed to publish to {topic}: {e}")
+            finally:
+                with self._outbound_cond:
+                    self._outbound_depth -= 1
+                    self._outbound_cond.notify_all()
+
+    def outbound_status(self):
+        with self._outbound_cond:
+            return dict(self.outbound_stats, depth=self._outbound_depth, max_queue=self.max_queue)
+
+    def flush(self, timeout=5.0):
+        # Waits until everything queued so far has been handed to the client
+        with self._outbound_cond:
+            return self._outbound_cond.wait_for(lambda: self._outbound_depth == 0, timeout=timeout)
 
     def stop(self):
+        self.flush(timeout=2.0)
+        with self._outbound_cond:
+            self._stopping = True
+            self._outbound_cond.notify_all()
         self.client.loop_stop()
         self.client.disconnect()
         print("[MQTT] Disconnected cleanly")
+
+
+class TopicChannel:
+    # Per-bay view of a shared MQTTHandler: same publish(topic_key, ...) interface,
+    # resolved against the bay's own topic map.
+    def __init__(self, handler, topics):
+        self.handler = handler
+        self.topics = topics
+        self.encodings = {}
+
+    def set_encodings(self, encodings):
+        self.encodings = validate_encodings(encodings, self.topics)
+
+    def log(self, level, message):
+        self.handler.log(level, message)
+
+    def preview(self, payload):
+        return self.handler.preview(payload)
+
+    def outbound_status(self):
+        return self.handler.outbound_status()
+
+    def publish(self, topic_key, data, retain=True):
+        if topic_key not in self.topics:
+            print(f"[MQTT WARNING] Unknown topic key: {topic_key}")
+            return
+        self.handler.publish_to(self.topics[topic_key], data, retain=retain,
+                                encoding=self.encodings.get(topic_key, "json"))
+
+
+def validate_encodings(encodings, topics):
+    # {"data": "columnar+zlib", "data_snapshot": "msgpack"}; raises ValueError
+    encodings = dict(encodings or {})
+    for topic_key, encoding in encodings.items():
+        if topic_key not in topics:
+            raise ValueError(f"Unknown topic key in encodings: {topic_key}")
+        codec.parse_encoding(encoding)
+    return encodings
@@ -0,0 +1,184 @@
+"""
+Simulated twin-screw wet granulation line for closed-loop testing.
+
+A SimulatedBay listens on <address>/input like the real line, "runs" each
+suggested setting for a randomized batch duration (divided by speedup) and
+publishes a noisy granule_quality_index on <address>/result.
+
+    python -m simulator.granulation --broker localhost:1883 --address LC/R8/133-1-1/PC06/bay --speedup 60
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from utils.data_handler import load_default_config
+
+
+class GranulationProcess:
+    # Smooth synthetic response surface over the default search space. Quality
+    # (0-10) peaks at a fast screw, low feed, fairly wet and cool setting (away
+    # from the center point), with penalties for over-wetting and starve feeding.
+    OPTIMUM = {
+        "screw_speed": 0.8,
+        "feed_rate": 0.25,
+        "liquid_ratio": 0.7,
+        "barrel_temperature": 0.2,
+        "binder_concentration": 0.35,
+    }
+    WEIGHTS = {
+        "screw_speed": 2.0,
+        "feed_rate": 1.5,
+        "liquid_ratio": 6.0,
+        "barrel_temperature": 1.0,
+        "binder_concentration": 3.0,
+    }
+
+    def __init__(self, config=None, noise=0.1, seed=None):
+        self.config = config or load_default_config()
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.objective_name = self.config["objective_name"]
+        self._bounds = {p["name"]: (p["lb"], p["ub"]) for p in self.config["parameters"]}
+
+    def true_quality(self, parameters):
+        u = {
+            name: (float(parameters[name]) - lb) / (ub - lb)
+            for name, (lb, ub) in self._bounds.items()
+        }
+        distance = sum(
+            self.WEIGHTS.get(name, 1.0) * (u[name] - self.OPTIMUM.get(name, 0.5)) ** 2 for name in u
+        )
+        # Over-wetting is worse when the binder is also high (paste, oversized granules)
+        overwet = max(0.0, u.get("liquid_ratio", 0.0) + u.get("binder_concentration", 0.0) - 1.2)
+        # Starve-fed screws give fines: penalize feed rate outrunning screw speed
+        starve = max(0.0, u.get("feed_rate", 0.0) - u.get("screw_speed", 1.0) - 0.2)
+        return 10.0 * np.exp(-distance) - 4.0 * overwet - 3.0 * starve
+
+    def evaluate(self, parameters):
+        value = self.true_quality(parameters) + self.noise * self.rng.standard_normal()
+        return {self.objective_name: round(float(value), 4)}
+
+    def best_quality(self):
+        return self.true_quality({
+            name: lb + self.OPTIMUM.get(name, 0.5) * (ub - lb) for name, (lb, ub) in self._bounds.items()
+        })
+
+
+class SimulatedBay:
+    # One production line behind an MQTT client (paho or benchmarks.fake_broker).
+    # Batch durations are in simulated seconds; speedup compresses them in wall time.
+    def __init__(self, client, address, process=None, duration_s=600.0, jitter=0.2, speedup=1.0,
+                 target=None, seed=None):
+        self.client = client
+        self.address = address
+        self.process = process or GranulationProcess(seed=seed)
+        self.duration_s = duration_s
+        self.jitter = jitter
+        self.speedup = speedup
+        self.target = target
+        self.rng = np.random.default_rng(seed)
+
+        self.started_at = None  # First input received; time-to-target is measured from here
+        self.completed = 0
+        self.best = None
+        self.reached = threading.Event()
+        self.time_to_target = None  # {"trials", "sim_s", "wall_s"}
+        self.stopped = False
+        self._lock = threading.Lock()
+        client.on_message = self._on_message
+
+    def start(self):
+        self.client.subscribe(self.address + "/input")
+
+    def stop(self):
+        self.stopped = True
+
+    def sim_elapsed(self):
+        return (time.time() - self.started_at) * self.speedup
+
+    def _on_message(self, client, userdata, msg):
+        # A retained input is the last suggestion from before we subscribed
+        if self.stopped or getattr(msg, "retain", False):
+            return
+        try:
+            payload = json.loads(msg.payload)
+        except (ValueError, TypeError) as e:
+            print(f"[SIMULATOR] Ignoring undecodable input on {msg.topic}: {e}")
+            return
+        if self.started_at is None:
+            self.started_at = time.time()
+        entries = payload["trials"] if isinstance(payload, dict) and "trials" in payload else [payload]
+        for entry in entries:
+            duration = max(0.0, self.duration_s * (1.0 + self.jitter * self.rng.standard_normal()))
+            timer = threading.Timer(duration / self.speedup, self._finish, args=(entry,))
+            timer.daemon = True
+            timer.start()
+
+    def _finish(self, entry):
+        if self.stopped:
+            return
+        parameters = entry.get("parameters", entry)
+        result = {"parameters": parameters, "metrics": self.process.evaluate(parameters)}
+        if "trial_index" in entry:
+            result["trial_index"] = entry["trial_index"]
+
+        value = result["metrics"][self.process.objective_name]
+        with self._lock:
+            self.completed += 1
+            self.best = value if self.best is None else max(self.best, value)
+            if self.target is not None and self.time_to_target is None and value >= self.target:
+                self.time_to_target = {
+                    "trials": self.completed,
+                    "sim_s": round(self.sim_elapsed(), 1),
+                    "wall_s": round(time.time() - self.started_at, 3),
+                }
+                self.reached.set()
+        self.client.publish(self.address + "/result", json.dumps(result))
+
+
+def main(argv=None):
+    import paho.mqtt.client as mqtt
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default="localhost:1883")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--address", action="append", required=True, help="bay address; repeat for several bays")
+    parser.add_argument("--duration-s", type=float, default=600.0, help="simulated batch duration")
+    parser.add_argument("--speedup", type=float, default=1.0)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    hostname, _, port = args.broker.partition(":")
+    bays = []
+    for i, address in enumerate(args.address):
+        client = mqtt.Client()
+        if args.username:
+            client.username_pw_set(args.username, args.password)
+        seed = None if args.seed is None else args.seed + i
+        bay = SimulatedBay(client, address, GranulationProcess(noise=args.noise, seed=seed),
+                           duration_s=args.duration_s, speedup=args.speedup, seed=seed)
+        client.connect(hostname, int(port or 1883))
+        client.loop_start()
+        bay.start()
+        bays.append(bay)
+        print(f"[SIMULATOR] Simulating {address} ({args.duration_s:.0f}s batches at {args.speedup:g}x)")
+
+    try:
+        while True:
+            time.sleep(10)
+            for bay in bays:
+                print(f"[SIMULATOR] {bay.address}: {bay.completed} batches, best {bay.best}")
+    except KeyboardInterrupt:
+        for bay in bays:
+            bay.stop()
+            bay.client.loop_stop()
+            bay.client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
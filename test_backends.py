@@ -0,0 +1,25 @@
+from core.optimizer import BayesianOptimizer
+from utils.data_handler import load_default_config
+
+
+def test_process_backend_records_generator_runs_on_the_host():
+    optimizer = BayesianOptimizer(dict(load_default_config(), execution_backend="process"))
+    client = optimizer.client
+    snapshots = []
+    to_json_snapshot = client._to_json_snapshot
+    client._to_json_snapshot = lambda: snapshots.append(1) or to_json_snapshot()
+    try:
+        for _ in range(3):
+            idx, params = optimizer.suggest_next()
+            optimizer.complete_or_attach_trial(params, {"granule_quality_index": params["feed_rate"]}, trial_index=idx)
+        assert len(client._generation_strategy._generator_runs) == 3
+        assert client._generation_strategy._curr.name == "Sobol"
+
+        # Serialized again only once the experiment has changed
+        count = len(snapshots)
+        optimizer.get_best_parameters()
+        optimizer.data_version += 1
+        optimizer.get_best_parameters()
+        assert len(snapshots) == count + 1
+    finally:
+        optimizer.close()
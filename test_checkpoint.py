@@ -0,0 +1,45 @@
+from conftest import ADDRESS, OBJECTIVE, drain, last_input, make_host, send, statuses
+from utils.data_handler import load_default_config
+
+
+def test_restore_replays_journal_tail(tmp_path):
+    host = make_host(tmp_path)
+    send(host, "setup", load_default_config())
+    # Only the setup is checkpointed; everything after lives in the journal
+    host.checkpoint_every = host.checkpoint_interval = 10 ** 6
+    send(host, "tagmap", {"screw_speed": "tag1"})
+    send(host, "python", True)
+    send(host, "result", {"parameters": last_input(host), "metrics": {OBJECTIVE: 1.5}})
+    assert host.journal.seq > host._checkpoint_seq
+
+    restored = make_host(tmp_path)
+    restored.enqueue_when_ready(restored.restore_checkpoint)
+    drain(restored)
+    assert statuses(restored) == statuses(host) == {0: "COMPLETED", 1: "RUNNING"}
+    assert restored.optimizer.trial_table[0]["metrics"] == {OBJECTIVE: 1.5}
+    assert restored.pending_trials == host.pending_trials
+    assert restored.tag_map == {"screw_speed": "tag1"}
+
+
+
+def test_result_received_before_crash_is_redispatched(tmp_path):
+    host = make_host(tmp_path)
+    send(host, "setup", load_default_config())
+    send(host, "tagmap", {"screw_speed": "tag1"})
+    send(host, "python", True)
+    # Crash while the result waits in the queue: it is journaled but never handled
+    host.enqueue_when_ready = lambda *args: None
+    host.handle_message(f"{ADDRESS}/result", {"parameters": last_input(host), "metrics": {OBJECTIVE: 2.0}})
+    assert list(host._inbox) == [host.journal.seq]
+
+    restored = make_host(tmp_path)
+    restored.enqueue_when_ready(restored.restore_checkpoint)
+    drain(restored)
+    assert restored.optimizer.trial_table[0]["metrics"] == {OBJECTIVE: 2.0}
+    assert not restored._inbox
+
+    # Handled now, so a second restart does not apply it again
+    again = make_host(tmp_path)
+    again.enqueue_when_ready(again.restore_checkpoint)
+    drain(again)
+    assert [row["trial_status"] for row in again.optimizer.trial_table.values()].count("COMPLETED") == 1
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from mqtt import codec
+
+PAYLOAD = {
+    "seq": 3,
+    "type": "snapshot",
+    "trials": [
+        {"trial_index": 0, "parameters": {"x": 1.5, "y": 2}, "metrics": {"score": 0.25}},
+        {"trial_index": 1, "parameters": {"x": 0.5}, "metrics": {"score": float("nan")}, "note": "manual"},
+    ],
+}
+
+ENCODINGS = ["json", "json+zlib", "columnar", "columnar+zlib"] + (
+    ["msgpack", "msgpack+zlib"] if codec.msgpack is not None else []
+)
+
+
+def same(a, b):
+    # NaN != NaN, so compare the JSON text
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_round_trip(encoding):
+    encoded = codec.encode(PAYLOAD, encoding)
+    assert codec.content_type(encoded) == encoding
+    decoded = codec.decode(encoded)
+    if encoding.startswith("columnar"):
+        # Missing nested keys come back as None
+        expected = json.loads(json.dumps(PAYLOAD))
+        expected["trials"][1]["parameters"]["y"] = None
+        expected["trials"][0]["note"] = None
+        assert same(decoded, expected)
+    else:
+        assert same(decoded, PAYLOAD)
+
+
+def test_plain_json_is_unframed_text():
+    encoded = codec.encode({"a": 1})
+    assert encoded == '{"a": 1}'
+    assert codec.decode(encoded) == {"a": 1}
+    assert codec.decode(encoded.encode()) == {"a": 1}
+
+
+def test_columnar_passes_other_payloads_through():
+    assert codec.to_columnar({"status": "ok"}) == {"status": "ok"}
+    assert codec.from_columnar([1, 2]) == [1, 2]
+
+
+@pytest.mark.parametrize("encoding", ["xml", "json+gzip", "columnar+lz4"])
+def test_unknown_encodings_are_rejected(encoding):
+    with pytest.raises(ValueError):
+        codec.parse_encoding(encoding)
+
+
+@pytest.mark.parametrize("payload", [b"\x1ejson+zlib", b"\x1ejson+zlib\nnot deflated", b"\x1ebogus\n{}", b"{not json"])
+def test_corrupt_payloads_raise_value_error(payload):
+    with pytest.raises(ValueError):
+        codec.decode(payload)
@@ -0,0 +1,80 @@
+import math
+
+import pandas as pd
+
+from utils.data_handler import detect_trial_changes, load_default_config, parse_input_parameters, parse_result_data
+
+TOLERANCES = {"x": 0.01, "y": 0.0001, "score": 0.01}
+
+
+def table():
+    return pd.DataFrame({
+        "trial_index": [0, 1, 2],
+        "x": [1.0, 2.0, 3.0],
+        "y": [0.1234, 0.5, 0.75],
+        "score": [10.0, 20.0, float("nan")],
+    })
+
+
+def row(idx, x, y, score):
+    return {"trial_index": idx, "parameters": {"x": x, "y": y}, "metrics": {"score": score}}
+
+
+def test_unchanged_rows_are_not_reported():
+    rows = [row(0, 1.0, 0.1234, 10.0), row(1, 2.004, 0.5, 20.0), row(2, 3.0, 0.75, float("nan"))]
+    assert detect_trial_changes(rows, table(), TOLERANCES) == []
+
+
+def test_edits_are_reported_per_column():
+    rows = [row(0, 1.0, 0.1236, 10.0), row(2, 3.0, 0.75, 5.0)]
+    changes = detect_trial_changes(rows, table(), TOLERANCES)
+    assert [(idx, sorted(diff)) for idx, diff, _ in changes] == [(0, ["y"]), (2, ["score"])]
+    assert changes[1][1]["score"] == {"old": None, "new": 5.0}
+
+
+def test_unknown_rows_are_new_trials():
+    changes = detect_trial_changes([row(None, 4.0, 0.2, 1.0), row(9, 1.0, 0.1234, 10.0)], table(), TOLERANCES)
+    assert [idx for idx, _, _ in changes] == [None, None]
+    assert changes[0][1]["x"] == {"old": None, "new": 4.0}
+
+
+def test_empty_table():
+    changes = detect_trial_changes([row(0, 1.0, 0.1, 1.0)], table().iloc[0:0], TOLERANCES)
+    assert len(changes) == 1 and changes[0][0] is None
+
+
+def test_choice_edits_are_compared_by_value():
+    df = table().assign(binder=["pvp", "hpmc", "pvp"])
+    tolerances = dict(TOLERANCES, binder=None)
+    rows = [row(0, 1.0, 0.1234, 10.0), row(1, 2.0, 0.5, 20.0)]
+    rows[0]["parameters"]["binder"] = "hpmc"
+    rows[1]["parameters"]["binder"] = "hpmc"
+    changes = detect_trial_changes(rows, df, tolerances)
+    assert [(idx, diff) for idx, diff, _ in changes] == [(0, {"binder": {"old": "pvp", "new": "hpmc"}})]
+
+
+def test_parse_input_and_result():
+    assert parse_input_parameters({"parameters": {"x": 1}}) == {"x": 1}
+    assert parse_input_parameters({"x": 1}) == {"x": 1}
+    assert parse_result_data({"parameters": {"x": 1}, "metrics": {"score": 2}}) == ({"x": 1}, {"score": 2})
+
+
+def test_published_records_echo_back_unchanged():
+    # trial_records must publish at the resolution change_tolerances() compares at
+    from core.optimizer import BayesianOptimizer
+
+    config = load_default_config()
+    for p in config["parameters"]:
+        if p["name"] == "liquid_ratio":
+            p["decimals"] = 4
+    config["metric_tolerances"] = {"granule_quality_index": 0.0001}
+    optimizer = BayesianOptimizer(config)
+    for i, ratio in enumerate([0.12345, 0.23456, 0.1]):
+        params = {"screw_speed": 300.123, "feed_rate": 10.0 + i, "liquid_ratio": ratio,
+                  "barrel_temperature": 40.0, "binder_concentration": 0.05}
+        idx = optimizer.attach_running_trial(params)
+        optimizer.complete_or_attach_trial(params, {"granule_quality_index": math.pi * (i + 1)}, trial_index=idx)
+
+    records = optimizer.trial_records()
+    assert records[0]["parameters"]["liquid_ratio"] == 0.1235
+    assert detect_trial_changes(records, optimizer.summarize(), optimizer.change_tolerances()) == []
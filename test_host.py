@@ -0,0 +1,169 @@
+import json
+
+from conftest import ADDRESS, OBJECTIVE, drain, hold, last_input, make_host, published, send, start_run, statuses
+from utils.data_handler import load_default_config
+
+
+def test_result_queued_before_trigger_off_still_completes(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host)
+    gate = hold(host)
+    host.handle_message(f"{ADDRESS}/result", {"parameters": last_input(host), "metrics": {OBJECTIVE: 1.5}})
+    host.handle_message(f"{ADDRESS}/python", False)
+    # Generation stops at once; the pending trial is released behind the result
+    assert not host.platform_running
+    assert host.pending_trials
+
+    gate.set()
+    drain(host)
+    assert statuses(host) == {0: "COMPLETED"}
+    assert host.optimizer.trial_table[0]["metrics"] == {OBJECTIVE: 1.5}
+    assert not host.pending_trials
+    assert len(published(host, "input")) == 1
+
+
+def test_trigger_off_abandons_outstanding_trials(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host)
+    host.handle_message(f"{ADDRESS}/python", False)
+    drain(host)
+    assert statuses(host) == {0: "ABANDONED"}
+    assert not host.pending_trials
+
+
+def test_speculative_candidate_is_regenerated_when_the_result_surprises_the_model(tmp_path, capsys):
+    host = make_host(tmp_path)
+    start_run(host, dict(load_default_config(), speculative=True))
+    # Observed value 1.05 is within the interval; 3.0 is outside it
+    for value, served in [(1.05, True), (3.0, False)]:
+        assert host._speculation is not None
+        pending = next(iter(host.pending_trials))
+        host._speculation.update(predictions={pending: (1.0, 0.1)}, incumbent=10.0)
+        capsys.readouterr()
+        send(host, "result", {"parameters": last_input(host), "metrics": {OBJECTIVE: value}})
+        assert ("Serving pre-generated candidate" in capsys.readouterr().out) is served
+    assert len(published(host, "input")) == 3
+
+
+def test_status_tick_survives_a_failed_publish(tmp_path, capsys):
+    host = make_host(tmp_path)
+    start_run(host)
+    host.publish_platform_status()
+    status = published(host, "platform_status")[-1]
+    assert status["pending_trials"] == [0] and status["awaiting_result"]
+
+    def fail():
+        raise RuntimeError("dictionary changed size during iteration")
+
+    host.publish_platform_status = fail
+    host._status_tick()
+    assert "dictionary changed size" in capsys.readouterr().err
+
+
+def test_deltas_are_sequenced_and_replay_to_the_snapshot(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host, dict(load_default_config(), snapshot_interval=2))
+    for value in (1.0, 2.0, 3.0):
+        send(host, "result", {"parameters": last_input(host), "metrics": {OBJECTIVE: value}})
+    send(host, "data_request", {})
+
+    deltas = [data for data in published(host, "data") if data.get("type") == "delta"]
+    assert [delta["seq"] for delta in deltas] == list(range(1, len(deltas) + 1))
+    # A subscriber applying every delta up to a snapshot's seq holds that snapshot
+    for snapshot in published(host, "data_snapshot")[1:]:
+        table = {}
+        for delta in deltas[:snapshot["seq"]]:
+            table.update((record["trial_index"], record) for record in delta["trials"])
+        assert json.dumps([table[idx] for idx in sorted(table)]) == json.dumps(snapshot["trials"])
+    assert len(published(host, "data_snapshot")) >= 3
+    assert published(host, "data_snapshot")[-1]["seq"] == deltas[-1]["seq"]
+
+
+def test_batch_results_queued_out_of_order_complete_their_own_trials(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host, dict(load_default_config(), batch_size=3))
+    batch = last_input(host)["trials"]
+    assert len(batch) == 3
+
+    def result(entry):
+        return {"parameters": entry["parameters"], "trial_index": entry["trial_index"],
+                "metrics": {OBJECTIVE: float(entry["trial_index"])}}
+
+    send(host, "result", result(batch[1]))
+    # The next batch waits for every outstanding trial
+    assert len(published(host, "input")) == 1
+    gate = hold(host)
+    for entry in (batch[2], batch[0]):
+        host.handle_message(f"{ADDRESS}/result", result(entry))
+    gate.set()
+    drain(host)
+
+    for entry in batch:
+        assert host.optimizer.trial_table[entry["trial_index"]]["metrics"] == {OBJECTIVE: float(entry["trial_index"])}
+        assert host.optimizer.trial_table[entry["trial_index"]]["trial_status"] == "COMPLETED"
+    assert len(published(host, "input")) == 2
+    assert sorted(host.pending_trials) == [entry["trial_index"] for entry in last_input(host)["trials"]]
+
+
+def test_burst_of_edits_is_flushed_once(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host)
+    inputs, deltas = len(published(host, "input")), len(published(host, "data"))
+    gate = hold(host)
+    for i in range(3):
+        parameters = dict(last_input(host), feed_rate=10.0 + i)
+        host.handle_message(f"{ADDRESS}/data_in", {"trials": [{"parameters": parameters, "metrics": {OBJECTIVE: i}}]})
+    gate.set()
+    drain(host)
+
+    assert list(statuses(host).values()).count("COMPLETED") == 3
+    # One suggestion and one delta for the whole burst
+    assert len(published(host, "input")) == inputs + 1
+    assert len(published(host, "data")) == deltas + 1
+
+
+def run_results(host, count):
+    # Each result is worse than the last, so trial 0 stays the best
+    for i in range(count):
+        send(host, "result", {"parameters": last_input(host), "metrics": {OBJECTIVE: -float(i)}})
+
+
+def test_window_scaling_fits_on_the_best_and_most_recent_trials(tmp_path):
+    host = make_host(tmp_path)
+    config = dict(load_default_config(), model_scaling="window", model_max_trials=4, model_keep_best=1)
+    start_run(host, config)
+    run_results(host, 7)
+
+    assert host.optimizer.training_trials() == [0, 4, 5, 6]
+    host.publish_platform_status()
+    model = published(host, "platform_status")[-1]["model"]
+    assert (model["scaling"], model["trained_on"], model["completed"]) == ("window", 4, 7)
+
+
+def test_warm_start_policy_alternates_cheap_fits_with_scheduled_refits(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host, dict(load_default_config(), fit_policy="warm_start", refit_every=2))
+    run_results(host, 9)
+
+    host.publish_platform_status()
+    fit = published(host, "platform_status")[-1]["model"]["fit"]
+    assert fit["policy"] == "warm_start"
+    assert fit["full_refits"] >= 2 and fit["cheap_fits"] >= 2
+    assert fit["fits_since_refit"] <= 2
+    assert host.optimizer.model_state
+
+
+def test_status_reports_the_command_queue_while_the_worker_is_busy(tmp_path):
+    host = make_host(tmp_path)
+    start_run(host)
+    gate = hold(host)
+    for _ in range(3):
+        host.handle_message(f"{ADDRESS}/data_request", {})
+    host.publish_platform_status()
+    gate.set()
+    drain(host)
+
+    status = published(host, "platform_status")[-1]
+    assert status["command_queue"]["depth"] >= 3
+    # Pending trials come from the last copy taken while the worker was free
+    assert status["pending_trials"] == sorted(host.pending_trials)
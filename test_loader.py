@@ -0,0 +1,21 @@
+from core import loader
+from utils.metrics import MetricsRegistry
+
+
+def test_queued_work_is_released_after_the_warmup():
+    seen = []
+    loader.start_background_load()
+    loader.when_ready(lambda: seen.append(loader.get_timings()))
+    loader._thread.join(300)
+    assert "warmup_fit" in seen[0] or loader.error
+
+
+def test_muted_thread_records_nothing():
+    registry = MetricsRegistry()
+    with registry.muted():
+        registry.observe("model_fit", 5.0)
+        registry.incr("messages_published")
+    registry.observe("generate", 1.0)
+    snapshot = registry.snapshot()
+    assert list(snapshot["stages"]) == ["generate"]
+    assert snapshot["counters"] == {}
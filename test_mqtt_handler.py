@@ -0,0 +1,56 @@
+import threading
+import time
+
+from mqtt import codec
+from mqtt.mqtt_handler import MQTTHandler
+
+TOPICS = {"status": "bay/status", "platform_status": "bay/platform_status", "data": "bay/data"}
+
+
+def make_handler(**kwargs):
+    # The publisher thread waits on `gate` before each send, like a slow client
+    handler = MQTTHandler("localhost", 1883, None, None, dict(TOPICS), **kwargs)
+    handler.sent = []
+    handler.gate = threading.Event()
+
+    def publish(topic, payload, retain=False):
+        handler.gate.wait(30)
+        handler.sent.append((topic, codec.decode(payload)))
+
+    handler.client.publish = publish
+    return handler
+
+
+def test_state_topics_are_coalesced_but_status_events_are_not():
+    handler = make_handler()
+    for i in range(5):
+        handler.publish("status", {"status": "manual_update", "trial_index": i})
+        handler.publish("platform_status", {"version": i})
+    handler.gate.set()
+    assert handler.flush()
+
+    assert [data["trial_index"] for topic, data in handler.sent if topic == "bay/status"] == [0, 1, 2, 3, 4]
+    # The first platform_status may already be in flight; the rest collapse into the last
+    assert [data["version"] for topic, data in handler.sent if topic == "bay/platform_status"][-1] == 4
+    assert handler.outbound_stats["coalesced"] >= 3
+
+
+def test_full_queue_drops_status_and_blocks_other_publishes():
+    handler = make_handler(max_queue=2, backpressure_timeout=30)
+    handler.publish("data", {"seq": 1}, retain=False)
+    while handler.outbound_status()["depth"] != 1 or handler._outbound:
+        time.sleep(0.01)  # seq 1 is in flight, held by the gate
+    handler.publish("status", {"status": "a"})
+    # Full: the queued status is dropped to make room
+    handler.publish("data", {"seq": 2}, retain=False)
+    assert handler.outbound_stats["dropped"] == 1
+
+    # Still full and nothing droppable: the producer waits for the publisher
+    producer = threading.Thread(target=handler.publish, args=("data", {"seq": 3}), kwargs={"retain": False})
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()
+    handler.gate.set()
+    producer.join(5)
+    assert handler.flush()
+    assert [data["seq"] for topic, data in handler.sent] == [1, 2, 3]
@@ -0,0 +1,21 @@
+from benchmarks.fake_broker import FakeBroker
+from bayes_platform.host import OptimizationHost
+from bayes_platform.multi_host import MultiBayHost
+
+
+def test_only_routed_topics_reach_the_host():
+    broker = FakeBroker()
+    host = MultiBayHost(address_pattern="SIM/+/bay", checkpoint_dir=None)
+    client = host.mqtt_handler.client = broker.client()
+    client.on_connect = host.mqtt_handler._on_connect
+    received = []
+    client.on_message = lambda client, userdata, msg: received.append(msg.topic)
+    client.connect()
+    assert sorted(client.subscriptions) == sorted(f"SIM/+/bay/{suffix}" for suffix in OptimizationHost.ROUTES)
+
+    line = broker.client()
+    line.connect()
+    for suffix in ("platform_status", "data_snapshot", "status", "metrics", "result", "data_in"):
+        line.publish(f"SIM/001/bay/{suffix}", "{}")
+    broker.wait_idle()
+    assert sorted(received) == ["SIM/001/bay/data_in", "SIM/001/bay/result"]
@@ -0,0 +1,67 @@
+import json
+
+from utils.persistence import TrialJournal, checkpoint_path, read_json, write_json_atomic
+
+
+def test_append_and_read_after(tmp_path):
+    journal = TrialJournal(str(tmp_path / "bay.journal"))
+    assert journal.append("setup", config={"a": 1}) == 1
+    assert journal.append("result", sync=True, metrics={"m": 2.5}) == 2
+    journal.append("abandon", trial_indices=[3])
+    journal.sync()
+
+    records = list(journal.read_after(1))
+    assert [(r["seq"], r["event"]) for r in records] == [(2, "result"), (3, "abandon")]
+    assert records[0]["metrics"] == {"m": 2.5}
+
+
+def test_reopen_continues_sequence(tmp_path):
+    path = str(tmp_path / "bay.journal")
+    journal = TrialJournal(path)
+    journal.append("setup")
+    journal.append("tagmap")
+    journal.close()
+
+    reopened = TrialJournal(path)
+    assert reopened.seq == 2
+    assert reopened.append("result") == 3
+
+
+def test_compact_keeps_only_later_records(tmp_path):
+    path = str(tmp_path / "bay.journal")
+    journal = TrialJournal(path)
+    for event in ("setup", "tagmap", "result", "result"):
+        journal.append(event)
+    journal.compact(3)
+    journal.append("abandon")
+    journal.close()
+
+    assert [r["seq"] for r in TrialJournal(path).read_after(0)] == [4, 5]
+
+
+def test_torn_final_line_is_ignored(tmp_path):
+    path = str(tmp_path / "bay.journal")
+    journal = TrialJournal(path)
+    journal.append("setup")
+    journal.append("result")
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"seq": 3, "event": "res')  # Crash mid-write
+
+    reopened = TrialJournal(path)
+    assert [r["event"] for r in reopened.read_after(0)] == ["setup", "result"]
+    assert reopened.seq == 2
+    # The next append starts a fresh line rather than extending the torn one
+    reopened.append("abandon")
+    reopened.close()
+    assert [r["seq"] for r in TrialJournal(path).read_after(0)] == [1, 2, 3]
+
+
+def test_checkpoint_files(tmp_path):
+    path = checkpoint_path(str(tmp_path), "LC/R8/133-1-1/PC06/bay")
+    assert path.endswith("LC_R8_133-1-1_PC06_bay.json")
+    assert read_json(path) is None
+    write_json_atomic(path, {"journal_seq": 7})
+    assert read_json(path) == {"journal_seq": 7}
+    with open(path) as f:
+        assert json.load(f) == {"journal_seq": 7}
@@ -0,0 +1,91 @@
+import pytest
+
+from utils.schemas import MessageError, MessageSchemas
+
+CONFIG = {
+    "parameters": [
+        {"name": "speed", "parameter_type": "range", "value_type": "float", "lb": 100, "ub": 600},
+        {"name": "ratio", "parameter_type": "range", "value_type": "float", "lb": 0.05, "ub": 0.3, "decimals": 4},
+        {"name": "passes", "parameter_type": "range", "value_type": "int", "lb": 1, "ub": 5},
+        {"name": "binder", "parameter_type": "choice", "value_type": "str", "values": ["pvp", "hpmc"]},
+    ],
+    "objective_name": "quality",
+}
+PARAMS = {"speed": 250.5, "ratio": 0.1234, "passes": 3, "binder": "pvp"}
+
+
+@pytest.fixture
+def schemas():
+    return MessageSchemas(CONFIG)
+
+
+def test_input_forms_are_normalized(schemas):
+    assert schemas.validate("input", PARAMS) == [{"parameters": PARAMS, "trial_index": None}]
+    assert schemas.validate("input", {"parameters": PARAMS, "trial_index": 4}) == [
+        {"parameters": PARAMS, "trial_index": 4}
+    ]
+    batch = schemas.validate("input", {"trials": [{"trial_index": 1, "parameters": PARAMS}, PARAMS]})
+    assert [entry["trial_index"] for entry in batch] == [1, None]
+
+
+def test_result(schemas):
+    result = schemas.validate("result", {"parameters": PARAMS, "metrics": {"quality": [1.0, 0.1], "yield": None}})
+    assert result == {"parameters": PARAMS, "metrics": {"quality": [1.0, 0.1], "yield": None}, "trial_index": None}
+
+
+@pytest.mark.parametrize("parameters, message", [
+    (dict(PARAMS, speed=700), "outside"),
+    (dict(PARAMS, speed=float("nan")), "must be a number"),
+    (dict(PARAMS, speed="fast"), "must be a number"),
+    (dict(PARAMS, passes=2.5), "integer"),
+    (dict(PARAMS, binder="starch"), "one of"),
+    (dict(PARAMS, extra=1), "unknown parameters"),
+    ({k: v for k, v in PARAMS.items() if k != "ratio"}, "missing parameters"),
+])
+def test_bad_parameters_are_rejected(schemas, parameters, message):
+    with pytest.raises(MessageError, match=message):
+        schemas.validate("result", {"parameters": parameters, "metrics": {"quality": 1.0}})
+
+
+def test_bounds_allow_half_a_rounding_step(schemas):
+    schemas.validate("input", dict(PARAMS, ratio=0.30004, speed=600.004))
+    with pytest.raises(MessageError):
+        schemas.validate("input", dict(PARAMS, ratio=0.3001))
+
+
+@pytest.mark.parametrize("metrics", [{}, {"other": 1.0}, {"quality": None}, {"quality": "good"}, {"quality": [1.0]}])
+def test_bad_result_metrics_are_rejected(schemas, metrics):
+    with pytest.raises(MessageError):
+        schemas.validate("result", {"parameters": PARAMS, "metrics": metrics})
+
+
+def test_data_in_allows_missing_metrics(schemas):
+    rows = [{"trial_index": 0, "parameters": PARAMS, "metrics": {"quality": float("nan")}},
+            {"parameters": PARAMS}]
+    assert schemas.validate("data_in", {"trials": rows}) == rows
+    with pytest.raises(MessageError, match="No trials"):
+        schemas.validate("data_in", {"trials": []})
+    with pytest.raises(MessageError, match="trial_index"):
+        schemas.validate("data_in", {"trials": [dict(rows[0], trial_index=-1)]})
+
+
+def test_before_setup_only_structure_is_checked():
+    schemas = MessageSchemas()
+    assert schemas.validate("result", {"parameters": {"anything": 1}, "metrics": {"m": 2}})["parameters"] == {"anything": 1}
+    with pytest.raises(MessageError):
+        schemas.validate("result", {"parameters": {}, "metrics": {"m": 2}})
+
+
+def test_other_topics():
+    schemas = MessageSchemas()
+    assert schemas.validate("python", 1) is True
+    assert schemas.validate("python", False) is False
+    assert schemas.validate("profile", "stop") == {"action": "stop"}
+    assert schemas.validate("history", {"path": "runs.csv"}) == "runs.csv"
+    assert schemas.validate("setup", CONFIG) is CONFIG
+    for suffix, payload in [("python", "on"), ("profile", {"mode": "gpu"}), ("profile", {"seconds": -1}),
+                            ("tagmap", ["a"]), ("history", 3), ("status", {}),
+                            ("setup", {"parameters": [], "objective_name": "q"}),
+                            ("setup", dict(CONFIG, parameters=CONFIG["parameters"] * 2))]:
+        with pytest.raises(MessageError):
+            schemas.validate(suffix, payload)
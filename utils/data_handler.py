@@ -1,10 +1,12 @@
-import pandas as pd
 import json
+import os
 import numpy as np
+from utils.metrics import METRICS
 
 def parse_config(payload):
     return json.loads(payload)
 
+@METRICS.timed("parse")
 def parse_input_parameters(payload):
     if isinstance(payload, str):
         try:
@@ -19,6 +21,7 @@ def parse_input_parameters(payload):
     else:
         return payload  # assume it's already the parameters dict
 
+@METRICS.timed("parse")
 def parse_result_data(payload):
     if isinstance(payload, str):
         try:
@@ -67,34 +70,93 @@ def load_default_config():
 
     return config
 
-def detect_trial_changes(new_trial: dict, df: pd.DataFrame, metric_name: str):
-    df_new = pd.json_normalize(new_trial)
-    df_new.rename(columns=lambda x: x.split('.')[-1], inplace=True)
-
-    df_compare = df[df_new.columns]  # ensure matching columns
-
-    for i in df_new.index:
-        row_changes = {}
-        for col in df_new.columns:
-            old = df_compare.loc[i, col]
-            new = df_new.loc[i, col]
-
-            try:
-                old_f = round(float(old), 2)
-                new_f = round(float(new), 2)
-                if pd.isna(old_f) != pd.isna(new_f) or not np.isclose(old_f, new_f, atol=0.01, equal_nan=True):
-                    row_changes[col] = {"old": old_f, "new": new_f}
-            except:
-                if str(old) != str(new):
-                    row_changes[col] = {"old": str(old), "new": str(new)}
-
-        if row_changes:
-            trial_idx = df_new.loc[i, "trial_index"]
-            return trial_idx, row_changes
-
-    return None, {}
-
-
+@METRICS.timed("detect_changes")
+def detect_trial_changes(new_trials: list, df: "pd.DataFrame", tolerances: dict):
+    """
+    Compare HMI-edited trials against the optimizer's trial table in one pass.
+    Rows are aligned on trial_index; parameter and metric columns are compared
+    as float arrays with a per-column absolute tolerance, or by value where the
+    tolerance is None (choice parameters).
+    Returns: [(trial_index or None, change_dict, trial), ...] for every changed
+    or new row.
+    """
+    import pandas as pd  # Deferred so the host can start before pandas loads
+
+    columns = [c for c in tolerances if c in df.columns]
+    new_index = np.array([
+        t["trial_index"] if isinstance(t.get("trial_index"), (int, np.integer)) else -1
+        for t in new_trials
+    ])
+    positions = pd.Index(df["trial_index"]).get_indexer(new_index) if len(df) else np.full(len(new_trials), -1)
+    known = positions >= 0
+
+    changed = np.zeros(len(new_trials), dtype=bool)
+    old_values, new_values, differs = {}, {}, {}
+    for col in columns:
+        raw = [t.get("parameters", {}).get(col, t.get("metrics", {}).get(col)) for t in new_trials]
+        if tolerances[col] is None:
+            new = np.empty(len(new_trials), dtype=object)
+            new[:] = raw
+            old = np.full(len(new_trials), None, dtype=object)
+            old[known] = df[col].to_numpy(dtype=object)[positions[known]]
+            diff = old != new
+        else:
+            new = pd.to_numeric(pd.Series(raw, dtype=object), errors="coerce").to_numpy(dtype=float)
+            old = np.full(len(new_trials), np.nan)
+            old[known] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)[positions[known]]
+            diff = ~np.isclose(old, new, rtol=0.0, atol=tolerances[col], equal_nan=True)
+        changed |= diff
+        old_values[col], new_values[col], differs[col] = old, new, diff
+
+    def _value(v):
+        if isinstance(v, np.generic):
+            v = v.item()
+        return None if isinstance(v, float) and np.isnan(v) else v
+
+    results = []
+    for i in np.flatnonzero(changed | ~known):
+        row_changes = {
+            col: {"old": _value(old_values[col][i]), "new": _value(new_values[col][i])}
+            for col in columns
+            if differs[col][i]
+        }
+        trial_idx = int(new_index[i]) if known[i] else None
+        results.append((trial_idx, row_changes, new_trials[i]))
+
+    return results
+
+
+
+
+def read_history(source):
+    """
+    Load historical trials for a warm start into a flat DataFrame with one
+    column per parameter and metric.
+    source: a DataFrame, a list of {"parameters": {...}, "metrics": {...}} (or
+    flat) records, a {"trials": [...]} payload, or a .json/.csv/.parquet path.
+    """
+    import pandas as pd
+
+    if isinstance(source, pd.DataFrame):
+        return source
+    if isinstance(source, str):
+        ext = os.path.splitext(source)[1].lower()
+        if ext == ".csv":
+            return pd.read_csv(source)
+        if ext in (".parquet", ".pq"):
+            return pd.read_parquet(source)  # Needs pyarrow or fastparquet
+        if ext != ".json":
+            raise ValueError(f"Unsupported history file type: {source}")
+        with open(source) as f:
+            source = json.load(f)
+    if isinstance(source, dict):
+        source = source.get("trials", [])
+    if not isinstance(source, list):
+        raise TypeError("History must be a list of trials, a DataFrame or a file path.")
+
+    df = pd.json_normalize(source)
+    df.columns = [c.split(".", 1)[1] if c.startswith(("parameters.", "metrics.")) else c for c in df.columns]
+    return df
 
 
 # def detect_trial_changes(new_trial: dict, df: pd.DataFrame, metric_name: str):
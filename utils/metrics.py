@@ -0,0 +1,155 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Histogram bucket upper bounds in milliseconds (Prometheus "le" labels)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    # Fixed buckets: O(log buckets) per observation, percentiles interpolated
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "p50_ms": _round(self.percentile(0.50)),
+            "p95_ms": _round(self.percentile(0.95)),
+            "p99_ms": _round(self.percentile(0.99)),
+            "max_ms": round(self.max, 3),
+        }
+
+
+def _round(v):
+    return None if v is None else round(v, 3)
+
+
+class MetricsRegistry:
+    # Per-stage latency histograms and event counters for the whole process
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def muted(self):
+        # Nothing this thread records inside the block is kept (e.g. warm-up work)
+        self._local.muted = True
+        try:
+            yield
+        finally:
+            self._local.muted = False
+
+    def observe(self, stage, ms):
+        if getattr(self._local, "muted", False):
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(ms)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - started) * 1000.0)
+
+    def timed(self, stage):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def incr(self, counter, n=1):
+        if getattr(self._local, "muted", False):
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "stages": {stage: h.summary() for stage, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP bayes_stage_latency_ms Time spent per host stage in milliseconds.",
+            "# TYPE bayes_stage_latency_ms histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS, h.counts):
+                    cumulative += n
+                    lines.append(f'bayes_stage_latency_ms_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'bayes_stage_latency_ms_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'bayes_stage_latency_ms_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'bayes_stage_latency_ms_count{{stage="{stage}"}} {h.count}')
+            lines.append("# TYPE bayes_events_total counter")
+            for counter, n in sorted(self.counters.items()):
+                lines.append(f'bayes_events_total{{event="{counter}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def start_http_server(port, registry=METRICS, address="127.0.0.1"):
+    # Prometheus text exposition on http://address:port/metrics
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    print(f"[METRICS] Serving Prometheus metrics on http://{address}:{port}/metrics")
+    return server
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+
+
+def checkpoint_path(checkpoint_dir, address, suffix=".json"):
+    # One file per bay address, e.g. LC_R8_133-1-1_PC06_bay.json
+    return os.path.join(checkpoint_dir, address.strip("/").replace("/", "_") + suffix)
+
+
+def write_json_atomic(path, data):
+    # Write to a temp file and rename so a crash never leaves a torn checkpoint
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class TrialJournal:
+    # Append-only JSON-lines log of one bay's state-changing events. Appends are
+    # fsynced in batches (sync() after each command, or immediately when asked);
+    # compact() drops the records a checkpoint already covers.
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = 0
+        self._file = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._truncate_torn_tail()
+        for record in self.read_after(0):
+            self.seq = record["seq"]
+
+    def _truncate_torn_tail(self):
+        # A crash mid-append leaves a partial last line; cut it off so the next
+        # append starts a line of its own instead of corrupting everything after
+        if not os.path.exists(self.path):
+            return
+        valid = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid += len(line)
+        if valid < os.path.getsize(self.path):
+            print(f"[JOURNAL] Dropping torn tail of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+
+    def read_after(self, seq):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Torn final line from a crash mid-write
+                if record["seq"] > seq:
+                    yield record
+
+    def append(self, event, sync=False, **fields):
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a")
+            self.seq += 1
+            self._file.write(json.dumps(dict(fields, seq=self.seq, event=event, t=time.time())) + "\n")
+            self._unsynced += 1
+            if sync:
+                self._sync()
+            return self.seq
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def compact(self, upto_seq):
+        with self._lock:
+            self._sync()
+            keep = list(self.read_after(upto_seq))
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for record in keep:
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a")
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,111 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+from utils.persistence import checkpoint_path
+
+# Reusable no-op context for commands run while nothing is being profiled
+NOT_PROFILING = nullcontext()
+
+
+class ProfilingSession:
+    # One on-demand profile of a host. CPU profiling is enabled only around the
+    # host's own commands (cProfile is per thread); allocation tracking uses
+    # tracemalloc, which is process-wide. Ends after `iterations` suggestions or
+    # `seconds`, whichever comes first.
+    def __init__(self, label, mode="cpu", iterations=None, seconds=None, top=15, output_dir="profiles"):
+        if mode not in ("cpu", "memory", "both"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        if iterations is None and seconds is None:
+            seconds = 60.0
+        self.label = label
+        self.mode = mode
+        self.iterations = iterations
+        self.seconds = seconds
+        self.top = int(top)
+        self.output_dir = output_dir
+        self.completed_iterations = 0
+        self.profiler = cProfile.Profile() if mode in ("cpu", "both") else None
+        self.skipped_commands = 0
+        self._enabled = False
+        self._owns_tracemalloc = False
+        self._alloc_start = None
+        self.started_at = time.time()
+
+    def start(self):
+        if self.mode in ("memory", "both"):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                self._owns_tracemalloc = True
+            self._alloc_start = tracemalloc.take_snapshot()
+        self.started_at = time.time()
+
+    # Wraps one host command: `with profile or NOT_PROFILING:`
+    def __enter__(self):
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+                self._enabled = True
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process; another bay has it
+                self.skipped_commands += 1
+        return self
+
+    def __exit__(self, *exc):
+        if self._enabled:
+            self.profiler.disable()
+            self._enabled = False
+        return False
+
+    def done(self):
+        if self.iterations is not None and self.completed_iterations >= self.iterations:
+            return True
+        return self.seconds is not None and time.time() - self.started_at >= self.seconds
+
+    def finish(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = checkpoint_path(self.output_dir, self.label, suffix=f"-{stamp}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        summary = {
+            "mode": self.mode,
+            "duration_s": round(time.time() - self.started_at, 3),
+            "iterations": self.completed_iterations,
+            "skipped_commands": self.skipped_commands,
+            "files": [],
+        }
+
+        # Allocations first, so building the CPU report does not show up in them
+        if self._alloc_start is not None:
+            diff = tracemalloc.take_snapshot().compare_to(self._alloc_start, "lineno")
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            with open(base + "_alloc.txt", "w") as f:
+                for stat in diff[:200]:
+                    f.write(f"{stat}\n")
+            summary["files"].append(base + "_alloc.txt")
+            summary["top_alloc"] = [
+                {
+                    "location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                    "size_diff_kb": round(stat.size_diff / 1024.0, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in diff[:self.top]
+            ]
+
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + ".prof")
+            summary["files"].append(base + ".prof")
+            # dump_stats leaves the raw pstats table on the profiler
+            rows = sorted(self.profiler.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+            summary["top_cpu"] = [
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({name})",
+                    "calls": calls,
+                    "tottime_ms": round(tottime * 1000.0, 2),
+                    "cumtime_ms": round(cumtime * 1000.0, 2),
+                }
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+            ]
+        return summary
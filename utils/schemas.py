@@ -0,0 +1,201 @@
+import math
+
+from utils.data_handler import parse_input_parameters, parse_result_data
+
+PROFILE_MODES = ("cpu", "memory", "both")
+
+
+class MessageError(ValueError):
+    # A payload that does not match its topic's schema; rejected before dispatch
+    pass
+
+
+def _require(condition, message):
+    if not condition:
+        raise MessageError(message)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_index(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+class ParameterSpec:
+    def __init__(self, p):
+        self.name = p["name"]
+        self.kind = p["parameter_type"]
+        self.is_int = p.get("value_type") == "int"
+        if self.kind == "range":
+            self.lb, self.ub = float(p["lb"]), float(p["ub"])
+            # Values are published rounded to "decimals", so a bound may be
+            # overshot by half a step
+            self.tolerance = 0.5 * 10.0 ** -int(p.get("decimals", 2))
+        else:
+            self.values = list(p["values"])
+
+    def check(self, value, where):
+        if self.kind == "choice":
+            _require(value in self.values, f"{where}: '{self.name}' must be one of {self.values}, got {value!r}")
+            return
+        _require(_is_number(value) and math.isfinite(value), f"{where}: '{self.name}' must be a number, got {value!r}")
+        _require(self.lb - self.tolerance <= value <= self.ub + self.tolerance,
+                 f"{where}: '{self.name}'={value} is outside [{self.lb:g}, {self.ub:g}]")
+        if self.is_int:
+            _require(float(value).is_integer(), f"{where}: '{self.name}' must be an integer, got {value}")
+
+
+class MessageSchemas:
+    # Per-topic payload schemas. Compiled once per setup config: parameter names,
+    # bounds and types come from config["parameters"]. Before any setup only the
+    # structure of input/result/data_in is checked. validate() returns the
+    # normalized message a handler receives, or raises MessageError.
+    def __init__(self, config=None):
+        self.parameters = {}
+        self.objective = None
+        if config:
+            self.parameters = {p["name"]: ParameterSpec(p) for p in config["parameters"]}
+            self.objective = config["objective_name"]
+        self._validators = {
+            "python": check_trigger,
+            "setup": check_setup,
+            "tagmap": check_tagmap,
+            "input": self.check_input,
+            "result": self.check_result,
+            "data_in": self.check_data_in,
+            "data_request": lambda payload: payload,
+            "history": check_history,
+            "profile": check_profile,
+        }
+
+    def validate(self, suffix, payload):
+        validator = self._validators.get(suffix)
+        _require(validator is not None, f"No schema for topic '{suffix}'")
+        return validator(payload)
+
+    def check_parameters(self, parameters, where):
+        _require(isinstance(parameters, dict) and parameters, f"{where}: parameters must be a non-empty object")
+        if not self.parameters:
+            return parameters
+        unknown = [name for name in parameters if name not in self.parameters]
+        _require(not unknown, f"{where}: unknown parameters {unknown}")
+        missing = [name for name in self.parameters if name not in parameters]
+        _require(not missing, f"{where}: missing parameters {missing}")
+        for name, spec in self.parameters.items():
+            spec.check(parameters[name], where)
+        return parameters
+
+    def check_metrics(self, metrics, where, allow_missing=False):
+        # Values are a number, [mean, sem] or null; NaN only for table rows
+        _require(isinstance(metrics, dict), f"{where}: metrics must be an object")
+        for name, value in metrics.items():
+            if isinstance(value, (list, tuple)):
+                _require(len(value) == 2 and all(_is_number(v) for v in value),
+                         f"{where}: metric '{name}' must be a number or [mean, sem]")
+            else:
+                _require(value is None or _is_number(value), f"{where}: metric '{name}' must be a number")
+        if not allow_missing and self.objective is not None:
+            value = metrics.get(self.objective)
+            value = value[0] if isinstance(value, (list, tuple)) else value
+            _require(value is not None and math.isfinite(value), f"{where}: no value for objective '{self.objective}'")
+        return metrics
+
+    def check_input(self, payload):
+        # {"parameters": {...}, "trial_index": i}, bare parameters, or {"trials": [...]}
+        entries = payload["trials"] if isinstance(payload, dict) and "trials" in payload else [payload]
+        _require(isinstance(entries, list) and entries, "Input: no trials")
+        checked = []
+        for n, entry in enumerate(entries):
+            where = f"Input {n}" if len(entries) > 1 else "Input"
+            _require(isinstance(entry, dict), f"{where}: must be an object")
+            trial_index = entry.get("trial_index") if "parameters" in entry else None
+            _require(trial_index is None or _is_index(trial_index), f"{where}: invalid trial_index {trial_index!r}")
+            parameters = parse_input_parameters(entry)
+            checked.append({"parameters": self.check_parameters(parameters, where), "trial_index": trial_index})
+        return checked
+
+    def check_result(self, payload):
+        _require(isinstance(payload, dict), "Result must be an object")
+        trial_index = payload.get("trial_index")
+        _require(trial_index is None or _is_index(trial_index), f"Result: invalid trial_index {trial_index!r}")
+        parameters, metrics = parse_result_data(payload)
+        _require(isinstance(metrics, dict) and metrics, "Result: metrics must be a non-empty object")
+        return {
+            "parameters": self.check_parameters(parameters, "Result"),
+            "metrics": self.check_metrics(metrics, "Result"),
+            "trial_index": trial_index,
+        }
+
+    def check_data_in(self, payload):
+        _require(isinstance(payload, dict), "data_in must be an object")
+        trials = payload.get("trials")
+        _require(isinstance(trials, list), "data_in: 'trials' must be a list")
+        _require(trials, "No trials in input.")
+        for n, trial in enumerate(trials):
+            where = f"data_in row {n}"
+            _require(isinstance(trial, dict), f"{where}: must be an object")
+            trial_index = trial.get("trial_index")
+            _require(trial_index is None or _is_index(trial_index), f"{where}: invalid trial_index {trial_index!r}")
+            self.check_parameters(trial.get("parameters"), where)
+            self.check_metrics(trial.get("metrics", {}), where, allow_missing=True)
+        return trials
+
+
+def check_trigger(payload):
+    _require(isinstance(payload, bool) or payload in (0, 1), f"Trigger must be true/false or 1/0, got {payload!r}")
+    return bool(payload)
+
+
+def check_setup(config):
+    _require(isinstance(config, dict), "Setup must be an object")
+    _require("parameters" in config, "Missing 'parameters'")
+    parameters = config["parameters"]
+    _require(isinstance(parameters, list) and parameters, "Setup: 'parameters' must be a non-empty list")
+    _require(isinstance(config.get("objective_name"), str), "Setup: missing 'objective_name'")
+    names = set()
+    for p in parameters:
+        _require(isinstance(p, dict) and isinstance(p.get("name"), str), f"Setup: invalid parameter {p!r}")
+        name = p["name"]
+        _require(name not in names, f"Setup: duplicate parameter '{name}'")
+        names.add(name)
+        if p.get("parameter_type") == "range":
+            _require(_is_number(p.get("lb")) and _is_number(p.get("ub")) and p["lb"] < p["ub"],
+                     f"Setup: '{name}' needs numeric lb < ub")
+        elif p.get("parameter_type") == "choice":
+            _require(isinstance(p.get("values"), list) and p["values"], f"Setup: '{name}' needs a list of values")
+        else:
+            raise MessageError(f"Unsupported parameter type: {p.get('parameter_type')}")
+    return config
+
+
+def check_tagmap(mapping):
+    _require(isinstance(mapping, dict), "Tag map must be a dictionary")
+    return mapping
+
+
+def check_history(source):
+    # Trials inline (list or {"trials": [...]}), or a file path (string or {"path": ...})
+    if isinstance(source, dict) and "path" in source:
+        source = source["path"]
+    if isinstance(source, dict):
+        _require(isinstance(source.get("trials"), list), "History: 'trials' must be a list")
+    else:
+        _require(isinstance(source, (str, list)), "History must be a path, a list of trials or {'trials': [...]}")
+    return source
+
+
+def check_profile(request):
+    # {"action": "start", "mode": "cpu"|"memory"|"both", "iterations": N, "seconds": T, "top": 15}
+    # or {"action": "stop"}; a bare "start"/"stop" string also works
+    if isinstance(request, str):
+        request = {"action": request}
+    _require(isinstance(request, dict), "Profile request must be an object or 'start'/'stop'")
+    request = dict(request, action=request.get("action", "start"))
+    _require(request["action"] in ("start", "stop"), f"Unknown profile action: {request['action']}")
+    _require(request.get("mode", "cpu") in PROFILE_MODES, f"Unknown profiling mode: {request.get('mode')}")
+    for key in ("iterations", "seconds", "top"):
+        value = request.get(key)
+        _require(value is None or (_is_number(value) and value > 0), f"Profile: '{key}' must be a positive number")
+    return request